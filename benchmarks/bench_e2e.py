@@ -0,0 +1,231 @@
+"""End-to-end scrape benchmark against a local image server and a fake WebDriver.
+
+Runs the real scrape_sources loop offline and writes a JSON result to
+benchmarks/results/ so runs can be compared across commits:
+
+    python benchmarks/bench_e2e.py --num 100 --latency-ms 40 --error-rate 0.02
+    python benchmarks/bench_e2e.py --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import streamlit_app as app  # noqa: E402
+from fakes import FakeDriver, ImageServer  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+QUALITY_RES = {"Fast": (300, 300), "High": (600, 600), "Ultra": (1000, 1000)}
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--sources", default="Pinterest,Unsplash,Wikimedia Commons")
+    p.add_argument("--query", default="benchmark")
+    p.add_argument("--num", type=int, default=60, help="image budget; 0 with --large means until exhausted")
+    p.add_argument("--large", action="store_true", help="use large run mode (on-disk dedupe state, no scroll cap)")
+    p.add_argument("--quality", choices=list(QUALITY_RES), default="High")
+    p.add_argument("--min-kb", type=int, default=50)
+    p.add_argument("--no-turbo", action="store_true")
+    p.add_argument("--sizes", default="640x480,1200x1600,2000x1400", help="comma-separated WxH choices")
+    p.add_argument("--formats", default="jpeg", help="comma-separated PIL formats")
+    p.add_argument("--latency-ms", type=float, default=20)
+    p.add_argument("--jitter-ms", type=float, default=10)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--burst-every", type=int, default=0, help="start a 429 burst every N requests")
+    p.add_argument("--burst-len", type=int, default=0, help="429 responses per burst")
+    p.add_argument("--per-page", type=int, default=24)
+    p.add_argument("--max-pages", type=int, default=20, help="scrolls before a source runs dry")
+    p.add_argument("--scroll-delay", type=float, default=0.05, help="simulated seconds per scroll")
+    p.add_argument("--page-wait", type=float, default=0.05, help="simulated seconds after driver.get")
+    p.add_argument("--out", default=RESULTS_DIR)
+    p.add_argument("--trace", help="also write a Chrome/Perfetto trace of the run to this path")
+    p.add_argument("--compare", help="earlier result JSON to diff against")
+    return p.parse_args(argv)
+
+
+def serve(config, port_queue):
+    server = ImageServer(config)
+    port_queue.put(server.port)
+    server.httpd.serve_forever()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run(args):
+    config = {
+        "sizes": [[int(v) for v in s.split("x")] for s in args.sizes.split(",")],
+        "formats": args.formats.split(","),
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "burst_every": args.burst_every,
+        "burst_len": args.burst_len,
+    }
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(config, port_queue), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+
+    sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+    driver = FakeDriver(
+        base_url,
+        {app.url_map(args.query, s): s for s in sources},
+        per_page=args.per_page,
+        max_pages=args.max_pages,
+    )
+    out_dir = tempfile.mkdtemp(prefix="ultra_bench_")
+
+    latencies = []
+    real_download = app.fast_download
+    real_scroll_delay = app.scroll_delay
+
+    def timed_download(*a, **kw):
+        t0 = time.perf_counter()
+        try:
+            return real_download(*a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - t0)
+
+    app.fast_download = timed_download
+    app.scroll_delay = lambda source, mode: args.scroll_delay
+
+    settings = {
+        "min_res": QUALITY_RES[args.quality],
+        "min_bytes": args.min_kb * 1024,
+        "allow_types": ["jpeg", "png", "webp"],
+        "orientation": "Any",
+        "unlock": True,
+        "turbo": not args.no_turbo,
+        "rate_mode": "Normal",
+        "page_wait": args.page_wait,
+        "max_scrolls": None if args.large else 40,
+    }
+    if args.large:
+        state_db = os.path.join(out_dir, "run_state.sqlite")
+        state = {
+            "found": app.SpillSet(state_db, "found"),
+            "hash_list": app.PackedHashes() if app.IMAGEHASH_AVAILABLE else [],
+            "digests": app.SpillSet(state_db, "digests"),
+        }
+    else:
+        state = {"found": set(), "hash_list": [], "digests": set()}
+    state.update({"digest_index": None, "source_stats": {}})
+    num = args.num or (float("inf") if args.large else 60)
+    accepted_bytes = []
+    trace = app.RunTrace(keep_spans=bool(args.trace))
+
+    started = time.perf_counter()
+    try:
+        stats = app.scrape_sources(
+            driver,
+            requests.Session(),
+            args.query,
+            sources,
+            num,
+            out_dir,
+            settings,
+            state,
+            on_accept=lambda meta, n: accepted_bytes.append(meta.get("bytes", 0)),
+            trace=trace,
+        )
+        elapsed = time.perf_counter() - started
+        server_stats = requests.get(f"{base_url}/__stats", timeout=5).json()
+    finally:
+        app.fast_download = real_download
+        app.scroll_delay = real_scroll_delay
+        if args.large:
+            state["found"].close()
+            state["digests"].close()
+        server.terminate()
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    if args.trace:
+        with open(args.trace, "w", encoding="utf-8") as f:
+            json.dump(trace.chrome_trace(), f)
+
+    accepted = stats["downloaded"]
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "config": vars(args),
+        "metrics": {
+            "accepted": accepted,
+            "duration_sec": round(elapsed, 3),
+            "images_per_sec": round(accepted / elapsed, 3) if elapsed else 0.0,
+            "bytes_per_sec": round(server_stats["bytes"] / elapsed, 1) if elapsed else 0.0,
+            "requests_per_image": round(server_stats["requests"] / accepted, 3) if accepted else None,
+            "p50_image_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p99_image_ms": round(percentile(latencies, 99) * 1000, 1),
+            "peak_rss_mb": peak_rss_mb(),
+        },
+        "scrape_stats": stats,
+        "stages": trace.histograms(),
+        "server_stats": server_stats,
+        "driver_calls": driver.calls,
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"vs {baseline.get('commit')} ({os.path.basename(baseline_path)})")
+    for key, value in current["metrics"].items():
+        before = baseline.get("metrics", {}).get(key)
+        if isinstance(value, (int, float)) and isinstance(before, (int, float)) and before:
+            print(f"  {key:<20} {before:>12} -> {value:>12}  ({(value - before) / before * 100:+.1f}%)")
+        else:
+            print(f"  {key:<20} {before!s:>12} -> {value!s:>12}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+    os.makedirs(args.out, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(args.out, f"e2e-{stamp}-{result['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    for key, value in result["metrics"].items():
+        print(f"{key:<20} {value}")
+    for stage, h in sorted(result["stages"].items(), key=lambda kv: -kv[1]["total_sec"]):
+        print(f"  {stage:<18} {h['total_sec']:>8}s  n={h['count']:<5} p50={h['p50_ms']}ms p99={h['p99_ms']}ms")
+    print(f"saved {path}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
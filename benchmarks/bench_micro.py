@@ -0,0 +1,223 @@
+"""Micro-benchmarks for the helpers on the scrape loop's hot path.
+
+Each case reports the best per-call time over several timeit repeats and is
+compared against benchmarks/baselines/micro.json:
+
+    python benchmarks/bench_micro.py                   # run all, compare to baseline
+    python benchmarks/bench_micro.py -k phash          # only cases whose name contains "phash"
+    python benchmarks/bench_micro.py --save-baseline   # record the current numbers as the baseline
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit_app as app  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "micro.json")
+
+# Full-size URL shapes as they appear in each site's page source.
+PAGE_URLS = {
+    "Pinterest": "https://i.pinimg.com/originals/{a}/{b}/{id}.jpg",
+    "Unsplash": "https://images.unsplash.com/photo-{id}?ixlib=rb-4.0.3&w=1080&q=80",
+    "Pexels": "https://images.pexels.com/photos/{id}/pexels-photo-{id}.jpeg?auto=compress&w=1260",
+    "Pixabay": "https://cdn.pixabay.com/photo/2023/01/{a}/{id}_1280.jpg",
+    "Imgur": "https://i.imgur.com/{id}m.jpg",
+    "DeviantArt": "https://images-wixmp-ed30a86b8c4ca887773594c2.wixmp.com/f/{id}.jpg?token={b}",
+    "Flickr": "https://live.staticflickr.com/65535/{id}_{b}_n.jpg",
+    "Wallhaven": "https://th.wallhaven.cc/small/{a}/wallhaven-{id}.jpg",
+    "Wikimedia Commons": "https://upload.wikimedia.org/wikipedia/commons/thumb/{a}/{b}/{id}.jpg/320px-{id}.jpg",
+}
+
+
+def sample_url(source, i):
+    return PAGE_URLS[source].format(id=f"{i:08x}abcd", a=f"{i % 256:02x}", b=f"{(i * 7) % 256:02x}")
+
+
+def page_source(source, target_bytes=2_000_000):
+    """Synthetic results page: image tags and JSON blobs interleaved with layout markup."""
+    chunks, size, i = [], 0, 0
+    filler = '<div class="grid-item"><a href="/pin/%d/"><span class="meta">%s</span></a></div>'
+    while size < target_bytes:
+        url = sample_url(source, i)
+        chunk = (
+            f'<img src="{url}" srcset="{url} 1x, {url} 2x" alt="result {i}">'
+            + filler % (i, "lorem ipsum dolor sit amet " * 4)
+            + f'<script>{{"id":{i},"image":"{url}","w":1080}}</script>'
+        )
+        chunks.append(chunk)
+        size += len(chunk)
+        i += 1
+    return "<html><body>" + "".join(chunks) + "</body></html>"
+
+
+def random_hashes(n, seed=0):
+    rng = random.Random(seed)
+    return [app.imagehash.hex_to_hash(f"{rng.getrandbits(64):016x}") for _ in range(n)]
+
+
+def metadata_rows(n):
+    rows = []
+    for i in range(n):
+        row = {
+            "url": sample_url("Pinterest", i),
+            "format": "JPEG",
+            "width": 1200,
+            "height": 1600,
+            "bytes": 350_000 + i,
+            "hash": f"{i:016x}",
+            "sha256": f"{i:064x}",
+            "path": f"/tmp/ultra/romantic_pinterest_{i}.jpg",
+            "query": "romantic",
+            "source": "Pinterest",
+            "timestamp": "2026-01-01T00:00:00Z",
+        }
+        if i % 10 == 0:
+            row["object"] = f"/tmp/ultra/objects/{i:064x}.jpg"
+        rows.append(row)
+    return rows
+
+
+def build_cases(workdir):
+    cases = {}
+    for source in PAGE_URLS:
+        html = page_source(source)
+        # A fixture the regexes don't match would time an empty scan.
+        assert app.extract_from_page_source(html, source), f"no candidates extracted from the {source} fixture"
+        cases[f"extract_from_page_source[{source}]"] = lambda html=html, source=source: app.extract_from_page_source(html, source)
+
+    urls = {s: [sample_url(s, i) for i in range(1000)] for s in PAGE_URLS}
+    for source, batch in urls.items():
+        cases[f"resolve_high_res[{source}]x1000"] = lambda batch=batch, source=source: [app.resolve_high_res(u, source) for u in batch]
+
+    mixed = [u for batch in urls.values() for u in batch[:112]] + ["data:image/png;base64,xx", "https://x.com/avatar/1.png"]
+    cases["is_valid_image_url x1010"] = lambda: [app.is_valid_image_url(u) for u in mixed]
+
+    srcset = ", ".join(f"{sample_url('Unsplash', i)} {w}w" for i, w in enumerate((236, 474, 736, 1080, 1600, 2400)))
+    cases["parse_srcset"] = lambda: app.parse_srcset(srcset)
+
+    queries = ["Romantic Aesthetic", "  dark/ACADEMIA 2024 ", "lo-fi  café ☕ vibes", "x" * 200]
+    cases["slugify x4"] = lambda: [app.slugify(q) for q in queries]
+
+    if app.IMAGEHASH_AVAILABLE:
+        probe = random_hashes(1, seed=99)[0]
+        for n in (1_000, 10_000, 100_000):
+            hashes = random_hashes(n)
+            cases[f"phash_near_duplicate_scan[{n}]"] = lambda hashes=hashes: app.is_near_duplicate(probe, hashes)
+            packed = app.PackedHashes()
+            for h in hashes:
+                packed.append(h)
+            cases[f"phash_packed_scan[{n}]"] = lambda packed=packed: app.is_near_duplicate(probe, packed)
+
+    corpus = []
+    for i, size in enumerate([(640, 480), (1200, 1600), (2400, 1600), (3000, 3000)] * 5):
+        path = os.path.join(workdir, f"sample_{i}.jpg")
+        Image.effect_noise((size[0] // 8, size[1] // 8), 64).resize(size).convert("RGB").save(path, quality=90)
+        corpus.append(path)
+    app.THUMB_DIR = os.path.join(workdir, "thumbnails")
+    os.makedirs(app.THUMB_DIR, exist_ok=True)
+
+    def cold_thumbnail(path=corpus[2]):
+        tpath = app.thumb_path(path)
+        if os.path.exists(tpath):
+            os.remove(tpath)
+        return app.get_thumbnail(path)
+
+    cases["get_thumbnail[cold 2400x1600]"] = cold_thumbnail
+    cases["get_thumbnail[cached]"] = lambda: app.get_thumbnail(corpus[2])
+    cases["create_zip[20 images]"] = lambda: app.create_zip(corpus)
+
+    for n in (1_000, 100_000):
+        rows = metadata_rows(n)
+        cases[f"metadata_to_csv[{n}]"] = lambda rows=rows: app.metadata_to_csv(rows)
+    return cases
+
+
+def measure(fn, repeat=5):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def fmt(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:9.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds:9.3f} s "
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("-k", dest="keyword", default="", help="only run cases containing this text")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--baseline", default=BASELINE_PATH)
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--tolerance", type=float, default=0.15, help="fractional slowdown flagged as a regression")
+    args = p.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+
+    workdir = tempfile.mkdtemp(prefix="ultra_micro_")
+    results = {}
+    regressions = 0
+    try:
+        for name, fn in build_cases(workdir).items():
+            if args.keyword not in name:
+                continue
+            results[name] = measure(fn, args.repeat)
+            line = f"{name:<45} {fmt(results[name])}"
+            before = baseline.get(name)
+            if before:
+                change = (results[name] - before) / before
+                flag = "  REGRESSION" if change > args.tolerance else ""
+                regressions += bool(flag)
+                line += f"   baseline {fmt(before)}  {change * 100:+6.1f}%{flag}"
+            print(line)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        merged = dict(baseline, **results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                    "python": platform.python_version(),
+                    "machine": platform.platform(),
+                    "results": merged,
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        print(f"saved baseline {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Offline stand-ins for the live sites: a synthetic image server and a fake WebDriver."""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from streamlit_app import NEW_IMAGES_JS, url_size_hint  # noqa: E402
+
+# Thumbnail-style URL per source, shaped so resolve_high_res and the CSS selectors
+# in extract_image_urls see what they would on the real site.
+SOURCE_PATHS = {
+    "Pinterest": "i.pinimg.com/236x/{id}.jpg",
+    "Unsplash": "images.unsplash.com/photo-{id}?w=400",
+    "Pexels": "images.pexels.com/photos/{id}.jpeg?w=500",
+    "Pixabay": "cdn.pixabay.com/photo/{id}_340.jpg",
+    "Imgur": "i.imgur.com/img{id}m.jpg",
+    "DeviantArt": "images-wixmp.com/f/{id}.jpg?token=x",
+    "Flickr": "live.staticflickr.com/{id}_n.jpg",
+    "Wallhaven": "th.wallhaven.cc/small/{id}.jpg",
+    "Wikimedia Commons": "upload.wikimedia.org/thumb/{id}.jpg/320px-{id}.jpg",
+}
+
+SRCSET_PATHS = {
+    "Pinterest": "i.pinimg.com/736x/{id}.jpg 736w",
+    "Unsplash": "images.unsplash.com/photo-{id}?w=1600 1600w",
+}
+
+DEFAULT_CONFIG = {
+    "sizes": [[640, 480], [1200, 1600], [2000, 1400]],
+    "formats": ["jpeg"],
+    "latency_ms": 20,
+    "jitter_ms": 10,
+    "error_rate": 0.0,
+    "burst_every": 0,
+    "burst_len": 0,
+}
+
+
+class ImageServer:
+    """Threaded HTTP server that renders a distinct noise image for every path it is asked for.
+
+    Sizes and formats are picked deterministically from the path; thumbnail-style paths
+    are served at the width they advertise. Latency, random 500s and periodic 429 bursts
+    are driven by `config` (see DEFAULT_CONFIG). `GET /__stats` returns request counters.
+    """
+
+    def __init__(self, config=None, port=0):
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.stats = {"requests": 0, "bytes": 0, "status": {}}
+        self.random = random.Random(0)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.base_url = f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def render(self, path):
+        with self.lock:
+            if path in self.cache:
+                return self.cache[path]
+        seed = zlib.crc32(path.split("?")[0].encode())
+        sizes = self.config["sizes"]
+        width, height = sizes[seed % len(sizes)]
+        hint = url_size_hint(path)
+        if hint and hint < width:
+            width, height = hint, max(1, height * hint // width)
+        img_format = self.config["formats"][seed % len(self.config["formats"])].upper()
+        buf = BytesIO()
+        noise = Image.effect_noise((max(1, width // 8), max(1, height // 8)), 64)
+        noise.resize((width, height)).convert("RGB").save(buf, img_format)
+        data = (buf.getvalue(), f"image/{img_format.lower()}")
+        with self.lock:
+            self.cache[path] = data
+        return data
+
+    def handle(self, request):
+        if request.path == "/__stats":
+            with self.lock:
+                body = json.dumps(self.stats).encode()
+            return self.reply(request, 200, body, "application/json", count=False)
+
+        cfg = self.config
+        with self.lock:
+            n = self.stats["requests"]
+            self.stats["requests"] += 1
+            failed = self.random.random() < cfg["error_rate"]
+        delay = cfg["latency_ms"] + self.random.uniform(-cfg["jitter_ms"], cfg["jitter_ms"])
+        time.sleep(max(0.0, delay) / 1000.0)
+        if cfg["burst_every"] and n % cfg["burst_every"] < cfg["burst_len"]:
+            return self.reply(request, 429, b"", "text/plain")
+        if failed:
+            return self.reply(request, 500, b"", "text/plain")
+        body, content_type = self.render(request.path)
+        self.reply(request, 200, body, content_type)
+
+    def reply(self, request, status, body, content_type, count=True):
+        if count:
+            with self.lock:
+                self.stats["bytes"] += len(body)
+                self.stats["status"][str(status)] = self.stats["status"].get(str(status), 0) + 1
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+
+class FakeElement:
+    def __init__(self, attrs):
+        self.attrs = attrs
+
+    def get_attribute(self, name):
+        return self.attrs.get(name)
+
+
+class FakeDriver:
+    """Minimal WebDriver that serves an infinite-scroll results page per `url_map` URL.
+
+    `pages` maps each search URL to its source name. Every scroll reveals `per_page`
+    more images pointing at the local ImageServer, up to `max_pages` pages.
+    NEW_IMAGES_JS is answered like a browser would, marking the images it returns.
+    """
+
+    def __init__(self, base_url, pages, per_page=24, max_pages=20):
+        self.base_url = base_url
+        self.pages = pages
+        self.per_page = per_page
+        self.max_pages = max_pages
+        self.source = None
+        self.page = 0
+        self.seen = set()
+        self.calls = {"get": 0, "find_elements": 0, "page_source": 0, "execute_script": 0}
+
+    def get(self, url):
+        self.calls["get"] += 1
+        self.source = self.pages.get(url)
+        self.page = 1
+        self.seen = set()
+
+    def elements(self):
+        if self.source not in SOURCE_PATHS:
+            return []
+        key = re.sub(r"[^a-z]", "", self.source.lower())
+        items = []
+        for i in range(self.page * self.per_page):
+            img_id = f"{key}{i:05d}"
+            attrs = {"src": f"{self.base_url}/{SOURCE_PATHS[self.source].format(id=img_id)}"}
+            if self.source in SRCSET_PATHS:
+                attrs["srcset"] = f"{attrs['src']} 236w, {self.base_url}/{SRCSET_PATHS[self.source].format(id=img_id)}"
+            items.append(attrs)
+        return items
+
+    def find_elements(self, by, selector):
+        self.calls["find_elements"] += 1
+        return [FakeElement(a) for a in self.elements() if self.matches(a, selector)]
+
+    @staticmethod
+    def matches(attrs, selector):
+        m = re.match(r"img\[(src|srcset)(?:\*='([^']+)')?\]", selector)
+        if not m:
+            return False
+        attr, needle = m.group(1), m.group(2)
+        return bool(attrs.get(attr)) and (needle is None or needle in attrs[attr])
+
+    def new_images(self, selectors):
+        rows = []
+        for selector in selectors:
+            for attrs in self.elements():
+                if attrs["src"] not in self.seen and self.matches(attrs, selector):
+                    self.seen.add(attrs["src"])
+                    rows.append([attrs.get("src") or attrs.get("data-src"), attrs.get("srcset")])
+        return rows
+
+    @property
+    def page_source(self):
+        self.calls["page_source"] += 1
+        imgs = "".join(f'<img src="{a["src"]}">' for a in self.elements())
+        return f"<html><body>{imgs}</body></html>"
+
+    def execute_script(self, script, *args):
+        self.calls["execute_script"] += 1
+        if script == NEW_IMAGES_JS:
+            return self.new_images(args[0])
+        if "scrollTo" in script:
+            self.page = min(self.page + 1, self.max_pages)
+
+    def quit(self):
+        pass
@@ -1,23 +1,45 @@
 ﻿import streamlit as st
 import os
 import re
+import sys
 import time
 import json
 import csv
+import math
+import bisect
+import random
+import socket
+import sqlite3
+import argparse
+import hashlib
 import requests
 import zipfile
+import tempfile
+import heapq
+import itertools
+import threading
+import queue
 import concurrent.futures
+from collections import Counter, deque
+from contextlib import contextmanager
 from datetime import datetime
-from urllib.parse import quote
+from urllib.parse import quote, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from io import BytesIO, StringIO
 from PIL import Image
 try:
     import imagehash
+    import numpy as np
     IMAGEHASH_AVAILABLE = True
 except Exception:
     IMAGEHASH_AVAILABLE = False
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except Exception:
+    PYARROW_AVAILABLE = False
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 
 # Page configuration - Mobile optimized
@@ -127,12 +149,60 @@ st.markdown(
 # Constants
 APP_DIR = os.path.join(os.path.expanduser("~"), ".ultra_scraper")
 HISTORY_PATH = os.path.join(APP_DIR, "history.json")
-META_PATH = os.path.join(APP_DIR, "last_metadata.json")
+META_PATH = os.path.join(APP_DIR, "last_metadata.jsonl")
+LEGACY_META_PATH = os.path.join(APP_DIR, "last_metadata.json")
 ERRORS_PATH = os.path.join(APP_DIR, "last_errors.txt")
-URL_CACHE_PATH = os.path.join(APP_DIR, "url_cache.json")
+URL_CACHE_PATH = os.path.join(APP_DIR, "url_cache.sqlite")
+LEGACY_URL_CACHE_PATH = os.path.join(APP_DIR, "url_cache.json")
 THUMB_DIR = os.path.join(APP_DIR, "thumbnails")
+EXPORT_DIR = os.path.join(APP_DIR, "exports")
+SOURCE_STATS_PATH = os.path.join(APP_DIR, "source_stats.json")
+DIGEST_INDEX_PATH = os.path.join(APP_DIR, "digest_index.json")
+TRACE_PATH = os.path.join(APP_DIR, "last_trace.json")
+PROFILE_PATH = os.path.join(APP_DIR, "last_profile.folded")
+QUEUE_PATH = os.path.join(APP_DIR, "work_queue.sqlite")
+
+# Metrics for long-running deployments (both optional)
+METRICS_PORT = int(os.environ.get("ULTRA_SCRAPER_METRICS_PORT", "0") or 0)
+METRICS_BIND = os.environ.get("ULTRA_SCRAPER_METRICS_BIND", "127.0.0.1")
+METRICS_TEXTFILE = os.environ.get("ULTRA_SCRAPER_METRICS_TEXTFILE", "")
+
+# Live progress/preview refresh budget
+PREVIEW_FPS = 4
+PREVIEW_STRIP = 6
+
+# Large runs
+GALLERY_PAGE = 60
+BATCH_LIMIT = 64
+EXHAUSTED_AFTER = 3
+
+# Download queue priorities
+PRIOR_WEIGHT = 4
+DEFER_BELOW = 0.3
+_candidate_seq = itertools.count()
+
+# Distributed mode
+LEASE_SEC = 120
+MAX_ATTEMPTS = 3
 
 # Helper functions
+def parse_cli_args(argv):
+    """Flags passed after `--`, e.g. `streamlit run streamlit_app.py -- --profile`."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--trace", action="store_true")
+    parser.add_argument("--worker", action="store_true")
+    parser.add_argument("--queue", default=QUEUE_PATH)
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--out", default=os.path.join(os.path.expanduser("~"), "Downloads", "UltraScraper"))
+    parser.add_argument("--lease-sec", type=int, default=LEASE_SEC)
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+CLI_ARGS = parse_cli_args(sys.argv[1:])
+
+
 def ensure_app_dir():
     if not os.path.exists(APP_DIR):
         os.makedirs(APP_DIR, exist_ok=True)
@@ -140,6 +210,25 @@ def ensure_app_dir():
         os.makedirs(THUMB_DIR, exist_ok=True)
 
 
+def atomic_write(path, data, fsync=True):
+    """Writes through a temp file and rename, so a crash never leaves a torn file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if isinstance(data, bytes):
+            f = open(tmp, "wb")
+        else:
+            f = open(tmp, "w", encoding="utf-8")
+        with f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
 def load_history():
     ensure_app_dir()
     if os.path.exists(HISTORY_PATH):
@@ -154,56 +243,141 @@ def load_history():
 def save_history(history):
     ensure_app_dir()
     try:
-        with open(HISTORY_PATH, "w", encoding="utf-8") as f:
-            json.dump(history[:20], f, indent=2)
+        atomic_write(HISTORY_PATH, json.dumps(history[:20], indent=2))
     except Exception:
         pass
 
 
-def load_last_metadata():
+def iter_metadata():
+    """Rows of the persisted metadata store (JSON Lines), one at a time."""
     if os.path.exists(META_PATH):
         try:
             with open(META_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
         except Exception:
-            return []
-    return []
+            return
+    elif os.path.exists(LEGACY_META_PATH):
+        try:
+            with open(LEGACY_META_PATH, "r", encoding="utf-8") as f:
+                rows = json.load(f)
+        except Exception:
+            return
+        yield from rows
+
+
+def load_last_metadata():
+    return list(iter_metadata())
 
 
 def save_last_metadata(metadata):
     ensure_app_dir()
     try:
-        with open(META_PATH, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=2)
+        atomic_write(META_PATH, "".join(json.dumps(row) + "\n" for row in metadata))
+        clear_file(LEGACY_META_PATH)
     except Exception:
         pass
 
 
+class MetadataSpill:
+    """Streams a large run's metadata to the JSONL store instead of session memory.
+
+    Rows go to a `.partial` file of this run's own that replaces the store on
+    `commit()`, so an interrupted run never clobbers the previous metadata and
+    concurrent sessions don't write into each other's rows.
+    """
+
+    def __init__(self, path=META_PATH):
+        ensure_app_dir()
+        self.path = path
+        fd, self.partial = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".partial")
+        self.file = os.fdopen(fd, "w", encoding="utf-8")
+        self.count = 0
+        self.files = 0
+
+    def append(self, row):
+        self.file.write(json.dumps(row) + "\n")
+        self.count += 1
+        if row.get("path"):
+            self.files += 1
+
+    def commit(self):
+        try:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            os.replace(self.partial, self.path)
+            clear_file(LEGACY_META_PATH)
+        finally:
+            self.file.close()
+            clear_file(self.partial)
+
+
 def save_errors(errors):
     ensure_app_dir()
     try:
-        with open(ERRORS_PATH, "w", encoding="utf-8") as f:
-            f.write("\n".join(errors))
+        atomic_write(ERRORS_PATH, "\n".join(errors))
     except Exception:
         pass
 
 
-def load_url_cache():
+def open_url_cache():
+    """URL cache as an on-disk set; accepted URLs are added as they arrive.
+
+    A URL cache from older versions (a JSON list) is imported once.
+    """
+    ensure_app_dir()
+    cache = SpillSet(URL_CACHE_PATH, "urls", persist=True)
+    if os.path.exists(LEGACY_URL_CACHE_PATH):
+        try:
+            with open(LEGACY_URL_CACHE_PATH, "r", encoding="utf-8") as f:
+                cache.update(json.load(f))
+            clear_file(LEGACY_URL_CACHE_PATH)
+        except Exception:
+            pass
+    return cache
+
+
+def load_source_stats():
     ensure_app_dir()
-    if os.path.exists(URL_CACHE_PATH):
+    if os.path.exists(SOURCE_STATS_PATH):
         try:
-            with open(URL_CACHE_PATH, "r", encoding="utf-8") as f:
-                return set(json.load(f))
+            with open(SOURCE_STATS_PATH, "r", encoding="utf-8") as f:
+                stats = json.load(f)
+            # Older files counted per source and bucket only, mixing quality levels; drop them.
+            return {
+                source: {k: v for k, v in levels.items() if isinstance(v, dict)}
+                for source, levels in stats.items()
+            }
         except Exception:
-            return set()
-    return set()
+            return {}
+    return {}
 
 
-def save_url_cache(urls):
+def save_source_stats(stats):
     ensure_app_dir()
     try:
-        with open(URL_CACHE_PATH, "w", encoding="utf-8") as f:
-            json.dump(sorted(list(urls)), f, indent=2)
+        atomic_write(SOURCE_STATS_PATH, json.dumps(stats, indent=2))
+    except Exception:
+        pass
+
+
+def load_digest_index():
+    ensure_app_dir()
+    if os.path.exists(DIGEST_INDEX_PATH):
+        try:
+            with open(DIGEST_INDEX_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+    return {}
+
+
+def save_digest_index(index):
+    ensure_app_dir()
+    try:
+        atomic_write(DIGEST_INDEX_PATH, json.dumps(index, indent=2))
     except Exception:
         pass
 
@@ -218,6 +392,22 @@ def clear_file(path):
     return False
 
 
+def clear_sqlite(path):
+    """Removes a SQLite file together with its WAL and shared-memory files."""
+    removed = clear_file(path)
+    for suffix in ("-wal", "-shm", "-journal"):
+        clear_file(path + suffix)
+    return removed
+
+
+def new_run_state_path():
+    """A SQLite file for one run's dedupe sets, unique so concurrent sessions don't collide."""
+    ensure_app_dir()
+    fd, path = tempfile.mkstemp(dir=APP_DIR, prefix="run_state.", suffix=".sqlite")
+    os.close(fd)
+    return path
+
+
 def clear_folder(folder):
     try:
         if not os.path.exists(folder):
@@ -233,6 +423,419 @@ def clear_folder(folder):
         return False, 0
 
 
+class RunTrace:
+    """Timed spans per stage and thread for one scrape run.
+
+    Spans feed the per-stage histograms in the run report. With `keep_spans` the raw
+    spans are also kept for export as a Chrome trace (chrome://tracing or
+    ui.perfetto.dev) with one timeline per worker.
+    """
+
+    BUCKETS_MS = (1, 10, 100, 1000, 10000)
+    MAX_SPANS = 200000
+    SAMPLE_SIZE = 4096
+
+    def __init__(self, enabled=True, keep_spans=False):
+        self.enabled = enabled
+        self.keep_spans = keep_spans
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.spans = []
+        self.dropped = 0
+        self.stages = {}
+
+    @contextmanager
+    def span(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, t0, time.perf_counter() - t0)
+
+    def add(self, stage, start, duration):
+        if not self.enabled:
+            return
+        ms = duration * 1000
+        with self.lock:
+            agg = self.stages.get(stage)
+            if agg is None:
+                agg = self.stages[stage] = {"count": 0, "total": 0.0, "max": 0.0, "buckets": [0] * (len(self.BUCKETS_MS) + 1), "sample": []}
+            agg["count"] += 1
+            agg["total"] += ms
+            agg["max"] = max(agg["max"], ms)
+            agg["buckets"][bisect.bisect_right(self.BUCKETS_MS, ms)] += 1
+            # Percentiles come from a fixed-size reservoir so long runs stay bounded.
+            if len(agg["sample"]) < self.SAMPLE_SIZE:
+                agg["sample"].append(ms)
+            else:
+                j = random.randrange(agg["count"])
+                if j < self.SAMPLE_SIZE:
+                    agg["sample"][j] = ms
+            if not self.keep_spans:
+                return
+            if len(self.spans) < self.MAX_SPANS:
+                self.spans.append((stage, threading.current_thread().name, start - self.started, duration))
+            else:
+                self.dropped += 1
+
+    def histograms(self):
+        labels = [f"<{b}ms" for b in self.BUCKETS_MS] + [f">={self.BUCKETS_MS[-1]}ms"]
+        report = {}
+        with self.lock:
+            for stage, agg in self.stages.items():
+                sample = sorted(agg["sample"])
+                report[stage] = {
+                    "count": agg["count"],
+                    "total_sec": round(agg["total"] / 1000, 3),
+                    "p50_ms": round(sample[len(sample) // 2], 2),
+                    "p99_ms": round(sample[min(len(sample) - 1, int(len(sample) * 0.99))], 2),
+                    "max_ms": round(agg["max"], 2),
+                    "buckets": dict(zip(labels, agg["buckets"])),
+                }
+        return report
+
+    def chrome_trace(self):
+        tids = {}
+        events = []
+        for stage, thread, start, duration in self.spans:
+            tid = tids.setdefault(thread, len(tids) + 1)
+            events.append(
+                {
+                    "name": stage,
+                    "cat": "scrape",
+                    "ph": "X",
+                    "ts": round(start * 1e6, 1),
+                    "dur": round(duration * 1e6, 1),
+                    "pid": 1,
+                    "tid": tid,
+                }
+            )
+        for thread, tid in tids.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread}})
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"dropped_spans": self.dropped}}
+
+
+NO_TRACE = RunTrace(enabled=False)
+
+
+def save_trace(trace):
+    ensure_app_dir()
+    try:
+        atomic_write(TRACE_PATH, json.dumps(trace.chrome_trace()))
+    except Exception:
+        pass
+
+
+class Metrics:
+    """Process-wide counters, gauges and histograms in Prometheus text format."""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    HELP = {
+        "ultra_scraper_runs_total": ("counter", "Scrape runs started."),
+        "ultra_scraper_runs_active": ("gauge", "Scrape runs in progress."),
+        "ultra_scraper_drivers_in_use": ("gauge", "Browser drivers currently checked out."),
+        "ultra_scraper_downloads_total": ("counter", "Images accepted."),
+        "ultra_scraper_skipped_total": ("counter", "Candidates rejected, by reason."),
+        "ultra_scraper_retries_total": ("counter", "HTTP retries."),
+        "ultra_scraper_http_responses_total": ("counter", "HTTP responses by status code."),
+        "ultra_scraper_bytes_fetched_total": ("counter", "Response body bytes fetched."),
+        "ultra_scraper_inflight_requests": ("gauge", "HTTP requests in flight."),
+        "ultra_scraper_queue_depth": ("gauge", "Candidates waiting in the download queue."),
+        "ultra_scraper_downloads_pending": ("gauge", "Downloads submitted to the worker pool and not yet finished."),
+        "ultra_scraper_writer_queue_depth": ("gauge", "Images waiting for the disk writer."),
+        "ultra_scraper_source_acceptance_ratio": ("gauge", "Learned share of candidates accepted."),
+        "ultra_scraper_image_seconds": ("histogram", "Time to fetch and process one candidate image."),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.histograms = {}
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        k = self.key(name, labels)
+        with self.lock:
+            self.values[k] = self.values.get(k, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.values[self.key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        k = self.key(name, labels)
+        with self.lock:
+            counts, total, n = self.histograms.get(k, ([0] * len(self.BUCKETS), 0.0, 0))
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    counts[i] += 1
+            self.histograms[k] = (counts, total + value, n + 1)
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        body = ",".join(
+            '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in pairs
+        )
+        return "{" + body + "}"
+
+    def render(self):
+        with self.lock:
+            values = dict(self.values)
+            histograms = {k: (list(c), t, n) for k, (c, t, n) in self.histograms.items()}
+        lines = []
+        for name, (kind, text) in self.HELP.items():
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, n in zip(self.BUCKETS, counts):
+                        lines.append(f"{name}_bucket{self.format_labels(labels, [('le', bound)])} {n}")
+                    lines.append(f"{name}_bucket{self.format_labels(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{self.format_labels(labels)} {round(total, 6)}")
+                    lines.append(f"{name}_count{self.format_labels(labels)} {count}")
+                continue
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f"{name}{self.format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+@st.cache_resource
+def get_metrics():
+    return Metrics()
+
+
+METRICS = get_metrics()
+
+
+class RunGauge:
+    """One run's share of a gauge that concurrent runs in the process also update.
+
+    Changes are applied with METRICS.inc, so shares add up instead of overwriting
+    each other, and `clear()` withdraws only this run's share.
+    """
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        with self.lock:
+            METRICS.inc(self.name, value - self.value, **self.labels)
+            self.value = value
+
+    def add(self, delta):
+        with self.lock:
+            METRICS.inc(self.name, delta, **self.labels)
+            self.value += delta
+
+    def clear(self):
+        self.set(0)
+
+
+@st.cache_resource
+def start_metrics_server(port, host=METRICS_BIND):
+    """Serves METRICS at http://<host>:<port>/metrics for the life of the process.
+
+    Returns None when the port is taken, e.g. by another worker on the same host.
+    """
+    metrics = get_metrics()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on {host}:{port}: {e}", file=sys.stderr)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_metrics_textfile(path):
+    # node_exporter's textfile collector needs the file replaced atomically.
+    try:
+        atomic_write(path, METRICS.render(), fsync=False)
+    except Exception:
+        pass
+
+
+@st.cache_resource
+def start_metrics_textfile(path, interval=15):
+    """Rewrites the node_exporter textfile every `interval` seconds."""
+
+    def loop():
+        while True:
+            write_metrics_textfile(path)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="metrics-textfile", daemon=True)
+    thread.start()
+    return thread
+
+
+def run_timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+class SamplingProfiler:
+    """Samples the run's threads at a fixed interval.
+
+    Only the thread that started the profiler, download workers and the disk writer
+    are sampled; server, metrics and other threads are left out.
+
+    Output is collapsed-stack text (one `frame;frame;frame count` line per stack), which
+    flamegraph.pl, speedscope and inferno read directly. Stacks are rooted at the thread
+    name with any worker number stripped, so all download workers share one tree.
+    Stacks blocked in a wait, select() or an idle pool worker are collapsed into
+    `<thread>;(idle)`.
+    """
+
+    THREAD_PREFIXES = ("download", "disk-writer")
+    # Leaf frames of blocked threads; an idle pool worker sits in _worker on a C queue get.
+    IDLE_FRAMES = {("threading.py", "wait"), ("selectors.py", "select"), ("thread.py", "_worker")}
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.running = False
+        self.thread = None
+        self.owner = None
+
+    def start(self):
+        self.owner = threading.get_ident()
+        self.running = True
+        self.thread = threading.Thread(target=self.loop, name="profiler", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+    def loop(self):
+        while self.running:
+            names = {
+                t.ident: re.sub(r"_\d+$", "", t.name)
+                for t in threading.enumerate()
+                if t.ident == self.owner or t.name.startswith(self.THREAD_PREFIXES)
+            }
+            for ident, frame in sys._current_frames().items():
+                if ident not in names:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in self.IDLE_FRAMES:
+                    self.stacks[f"{names[ident]};(idle)"] += 1
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names[ident])
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def top(self, limit=15):
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames or frames == ["(idle)"]:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        overall = sum(own.values()) or 1
+        return [
+            {
+                "function": frame,
+                "self_pct": round(100.0 * count / overall, 1),
+                "total_pct": round(100.0 * total[frame] / overall, 1),
+            }
+            for frame, count in own.most_common(limit)
+        ]
+
+    def idle_pct(self):
+        """Share of thread samples that were blocked in a wait or select()."""
+        idle = sum(count for stack, count in self.stacks.items() if stack.endswith(";(idle)"))
+        return round(100.0 * idle / (sum(self.stacks.values()) or 1), 1)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProgressThrottle:
+    """Coalesces progress and live-preview updates to at most `fps` renders per second.
+
+    `render(downloaded, thumbs)` receives the latest count and a rolling strip of the
+    newest thumbnails, so UI cost stays flat however fast images are accepted.
+    """
+
+    def __init__(self, render, fps=PREVIEW_FPS, strip=PREVIEW_STRIP):
+        self.render = render
+        self.interval = 1.0 / fps
+        self.thumbs = deque(maxlen=strip)
+        self.downloaded = 0
+        self.pending = False
+        self.last = 0.0
+
+    def update(self, downloaded, thumb=None):
+        self.downloaded = downloaded
+        if thumb:
+            self.thumbs.append(thumb)
+        self.pending = True
+        if time.monotonic() - self.last >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.render(self.downloaded, list(self.thumbs))
+        self.pending = False
+        self.last = time.monotonic()
+
+
+def save_profile(profiler):
+    ensure_app_dir()
+    try:
+        profiler.save(PROFILE_PATH)
+    except Exception:
+        pass
+
+
 def slugify(text):
     text = text.strip().lower()
     text = re.sub(r"[^a-z0-9]+", "-", text)
@@ -260,16 +863,18 @@ def resolve_high_res(url, source):
             if "/f/" in url:
                 return url.split("?")[0]
         if source == "Flickr":
-            return re.sub(r"_([a-zA-Z])\\.jpg", r"_b.jpg", url)
+            # Only sizes below _b (1024px) are upgraded; _h/_k/_o are already larger and
+            # _o needs its own secret.
+            return re.sub(r"_[stqmnwzc]\.jpg", "_b.jpg", url)
         if source == "Wallhaven":
-            m = re.search(r"wallhaven-([a-zA-Z0-9]+)\\.", url)
+            m = re.search(r"wallhaven-([a-zA-Z0-9]+)\.([a-zA-Z]+)", url)
             if m:
-                wid = m.group(1)
-                return f"https://w.wallhaven.cc/full/{wid[:2]}/wallhaven-{wid}.jpg"
+                wid, ext = m.groups()
+                return f"https://w.wallhaven.cc/full/{wid[:2]}/wallhaven-{wid}.{ext}"
         if source == "Wikimedia Commons":
             if "/thumb/" in url:
                 url = url.replace("/thumb/", "/")
-                url = re.sub(r"/\\d+px-[^/]+$", "", url)
+                url = re.sub(r"/\d+px-[^/]+$", "", url)
                 return url
     except Exception:
         pass
@@ -335,7 +940,112 @@ def parse_srcset(srcset):
     return best
 
 
+def parse_srcset_width(srcset):
+    """Width descriptor (e.g. `1200w`) of the entry parse_srcset picks, or 0."""
+    if not srcset:
+        return 0
+    parts = [p.strip() for p in srcset.split(",") if p.strip()]
+    if not parts:
+        return 0
+    bits = parts[-1].split()
+    if len(bits) > 1 and bits[-1].endswith("w"):
+        try:
+            return int(bits[-1][:-1])
+        except ValueError:
+            return 0
+    return 0
+
+
+def url_size_hint(url):
+    """Rough pixel width a candidate URL advertises, or 0 when it says nothing."""
+    if not url:
+        return 0
+    if "/originals/" in url or "wallhaven.cc/full/" in url:
+        return 4000
+    if "th.wallhaven.cc/small/" in url:
+        return 300
+    for pattern in (
+        r"/(\d{2,4})x/",  # Pinterest /236x/, /736x/
+        r"/(\d{2,5})px-",  # Wikimedia thumbnails
+        r"[?&]w=(\d{2,5})",  # Unsplash/Pexels width param
+        r"_(\d{3,4})\.",  # Pixabay _340. / _1280.
+    ):
+        m = re.search(pattern, url)
+        if m:
+            return int(m.group(1))
+    m = re.search(r"staticflickr\.com/.+_([a-z])\.jpg", url)
+    if m:
+        return {"s": 75, "t": 100, "q": 150, "m": 240, "n": 320, "z": 640, "c": 800, "b": 1024, "h": 1600, "k": 2048, "o": 4000}.get(m.group(1), 0)
+    return 0
+
+
+def size_bucket(hint):
+    if not hint:
+        return "unknown"
+    if hint < 400:
+        return "xs"
+    if hint < 800:
+        return "s"
+    if hint < 1200:
+        return "m"
+    return "l"
+
+
+def candidate_score(source, hint, min_width, source_stats):
+    """Expected chance a candidate is accepted, learned per source, minimum width and size bucket.
+
+    Acceptance depends on the quality threshold, so outcomes from one `min_width`
+    never score candidates for another.
+    """
+    if not hint:
+        prior = 0.5
+    elif hint >= min_width:
+        prior = 0.9
+    else:
+        prior = 0.15
+    accepted, attempted = source_stats.get(source, {}).get(str(min_width), {}).get(size_bucket(hint), [0, 0])
+    return (accepted + prior * PRIOR_WEIGHT) / (attempted + PRIOR_WEIGHT)
+
+
+def push_candidate(queue, url, source, width, min_width, source_stats):
+    hint = width or url_size_hint(url)
+    score = candidate_score(source, hint, min_width, source_stats)
+    heapq.heappush(queue, (-score, -hint, next(_candidate_seq), url, size_bucket(hint)))
+
+
+def pop_candidates(queue, limit, min_score=0.0):
+    """Pops up to `limit` (url, bucket) pairs, best first, stopping below `min_score`."""
+    batch = []
+    while queue and len(batch) < limit and -queue[0][0] >= min_score:
+        _, _, _, url, bucket = heapq.heappop(queue)
+        batch.append((url, bucket))
+    return batch
+
+
+def record_outcome(source_stats, source, min_width, bucket, accepted):
+    counts = source_stats.setdefault(source, {}).setdefault(str(min_width), {}).setdefault(bucket, [0, 0])
+    if accepted:
+        counts[0] += 1
+    counts[1] += 1
+
+
+# Returns [src, srcset] for every <img> matching the selectors that an earlier call
+# on this page hasn't returned yet, marking each one as it goes, so a scroll only
+# costs a round trip for the images it revealed.
+NEW_IMAGES_JS = """
+const rows = [];
+for (const selector of arguments[0]) {
+    for (const img of document.querySelectorAll(selector + ":not([data-ultra-seen])")) {
+        img.setAttribute("data-ultra-seen", "");
+        rows.push([img.src || img.getAttribute("data-src"), img.getAttribute("srcset")]);
+    }
+}
+return rows;
+"""
+
+
 def extract_image_urls(driver, source):
+    """(url, srcset width) candidates from images added to the page since the last call."""
     selectors = {
         "Pinterest": ["img[src*='pinimg.com']", "img[srcset*='pinimg.com']"],
         "Unsplash": ["img[src*='images.unsplash.com']", "img[srcset*='images.unsplash.com']"],
@@ -349,17 +1059,14 @@ def extract_image_urls(driver, source):
     }
     urls = []
     fallback = ["img[src]", "img[srcset]"]
-    for sel in selectors.get(source, fallback) + fallback:
-        for img in driver.find_elements(By.CSS_SELECTOR, sel):
-            try:
-                src = img.get_attribute("src") or img.get_attribute("data-src")
-                srcset = img.get_attribute("srcset")
-                srcset_best = parse_srcset(srcset)
-                for candidate in [srcset_best, src]:
-                    if is_valid_image_url(candidate):
-                        urls.append(candidate)
-            except Exception:
-                continue
+    try:
+        rows = driver.execute_script(NEW_IMAGES_JS, selectors.get(source, fallback) + fallback) or []
+    except Exception:
+        return urls
+    for src, srcset in rows:
+        for candidate, width in [(parse_srcset(srcset), parse_srcset_width(srcset)), (src, 0)]:
+            if is_valid_image_url(candidate):
+                urls.append((candidate, width))
     return urls
 
 
@@ -368,41 +1075,57 @@ def extract_from_page_source(html, source):
     if not html:
         return urls
     if source == "Pinterest":
-        urls.extend(re.findall(r"https://i\\.pinimg\\.com/originals/[^\"\\s]+", html))
+        urls.extend(re.findall(r"https://i\.pinimg\.com/originals/[^\"\s]+", html))
     if source == "Unsplash":
-        urls.extend(re.findall(r"https://images\\.unsplash\\.com/[^\"\\s]+", html))
+        urls.extend(re.findall(r"https://images\.unsplash\.com/[^\"\s]+", html))
     if source == "Pexels":
-        urls.extend(re.findall(r"https://images\\.pexels\\.com/[^\"\\s]+", html))
+        urls.extend(re.findall(r"https://images\.pexels\.com/[^\"\s]+", html))
     if source == "Pixabay":
-        urls.extend(re.findall(r"https://cdn\\.pixabay\\.com/[^\"\\s]+", html))
+        urls.extend(re.findall(r"https://cdn\.pixabay\.com/[^\"\s]+", html))
     if source == "Imgur":
-        urls.extend(re.findall(r"https://i\\.imgur\\.com/[^\"\\s]+", html))
+        urls.extend(re.findall(r"https://i\.imgur\.com/[^\"\s]+", html))
     if source == "DeviantArt":
-        urls.extend(re.findall(r"https://[^\"\\s]*wixmp\\.com/[^\"\\s]+", html))
+        urls.extend(re.findall(r"https://[^\"\s]*wixmp\.com/[^\"\s]+", html))
     if source == "Flickr":
-        urls.extend(re.findall(r"https://live\\.staticflickr\\.com/[^\"\\s]+", html))
+        urls.extend(re.findall(r"https://live\.staticflickr\.com/[^\"\s]+", html))
     if source == "Wallhaven":
-        urls.extend(re.findall(r"https://[^\"\\s]*wallhaven\\.cc/[^\"\\s]+wallhaven-[^\"\\s]+", html))
+        urls.extend(re.findall(r"https://[^\"\s]*wallhaven\.cc/[^\"\s]+wallhaven-[^\"\s]+", html))
     if source == "Wikimedia Commons":
-        urls.extend(re.findall(r"https://upload\\.wikimedia\\.org/[^\"\\s]+", html))
+        urls.extend(re.findall(r"https://upload\.wikimedia\.org/[^\"\s]+", html))
     return urls
 
 
-def request_with_retry(session, url, max_retries=3):
+def request_with_retry(session, url, max_retries=3, trace=NO_TRACE):
     last_error = None
     retries = 0
+    host = urlparse(url).netloc
     for attempt in range(max_retries):
         try:
-            response = session.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=(5, 12))
+            t0 = time.perf_counter()
+            METRICS.inc("ultra_scraper_inflight_requests", 1, host=host)
+            try:
+                response = session.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=(5, 12))
+            finally:
+                METRICS.inc("ultra_scraper_inflight_requests", -1, host=host)
+            # `elapsed` stops at the response headers; the rest is body transfer.
+            ttfb = response.elapsed.total_seconds()
+            trace.add("http_ttfb", t0, ttfb)
+            trace.add("http_body", t0 + ttfb, max(0.0, time.perf_counter() - t0 - ttfb))
+            METRICS.inc("ultra_scraper_http_responses_total", host=host, status=response.status_code)
+            METRICS.inc("ultra_scraper_bytes_fetched_total", len(response.content), host=host)
             if response.status_code in (429, 500, 502, 503, 504):
                 retries += 1
-                time.sleep(1.2 * (2 ** attempt))
+                METRICS.inc("ultra_scraper_retries_total", host=host)
+                with trace.span("retry_backoff"):
+                    time.sleep(1.2 * (2 ** attempt))
                 continue
             return response, retries
         except Exception as e:
             last_error = e
             retries += 1
-            time.sleep(1.0 * (2 ** attempt))
+            METRICS.inc("ultra_scraper_retries_total", host=host)
+            with trace.span("retry_backoff"):
+                time.sleep(1.0 * (2 ** attempt))
     raise RuntimeError(f"{last_error}||retries={retries}")
 
 
@@ -454,50 +1177,454 @@ def scroll_delay(source, mode):
     return base
 
 
-def fast_download(session, url, folder, name, min_size, min_bytes, allow_types, orientation, hash_list):
+def cas_object_path(root, digest, ext):
+    return os.path.join(root, "objects", digest[:2], digest[2:4], digest + ext)
+
+
+def place_link(path, link):
+    """Hardlinks `link` to `path` and returns where the view can be read.
+
+    Where hardlinks aren't supported the view is the stored object itself, so the
+    bytes are still kept only once.
+    """
+    if os.path.exists(link):
+        return link
+    try:
+        os.link(path, link)
+        return link
+    except Exception:
+        return path
+
+
+def store_file(path, data, links=(), writer=None):
+    """Stores `data` at `path` (unless already there) plus hardlinked `links`.
+
+    Returns the path of the first view (or `path` itself). With a DiskWriter the work
+    is queued and a Future for that path is returned instead.
+    """
+    if writer is not None:
+        return writer.write(path, data, links)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        atomic_write(path, data)
+    views = [place_link(path, link) for link in links]
+    return views[0] if views else path
+
+
+class DiskWriter:
+    """Dedicated writer stage for downloaded images.
+
+    Network workers hand bytes to `write()` and carry on; the bounded queue blocks
+    them only when the disk falls behind. Each batch is written to temp files,
+    fsynced together, renamed into place, and the touched directories fsynced once.
+    Every write returns a Future, settled only after that sync, so callers learn
+    whether the bytes actually landed.
+    """
+
+    def __init__(self, trace=NO_TRACE, max_pending=64, batch_size=16):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.trace = trace
+        self.batch_size = batch_size
+        self.errors = []
+        self.thread = None
+        self.depth = RunGauge("ultra_scraper_writer_queue_depth")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="disk-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def write(self, path, data, links=(), optional=False):
+        """Queues `data` for `path` plus hardlinked `links`.
+
+        The returned Future resolves to the path the file can be read from, or raises
+        the error that kept it off the disk. An `optional` file (a thumbnail) that
+        already exists is left as it is.
+        """
+        future = concurrent.futures.Future()
+        self.queue.put((path, data, tuple(links), optional, future))
+        self.depth.set(self.queue.qsize())
+        return future
+
+    def close(self):
+        """Waits for everything queued so far to reach the disk."""
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        self.depth.clear()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.depth.set(self.queue.qsize())
+            items = [b for b in batch if b is not None]
+            if items:
+                self.flush(items)
+            if batch[-1] is None:
+                return
+
+    def flush(self, items):
+        staged = []
+        with self.trace.span("disk_write"):
+            for path, data, links, optional, future in items:
+                if os.path.exists(path):
+                    # A content-addressed object already holds these bytes; a plain
+                    # view path taken by another file means this image was not saved.
+                    if not links and not optional:
+                        self.fail(future, f"write {path}", FileExistsError(f"{path} already exists"))
+                        continue
+                    staged.append((None, None, path, links, future))
+                    continue
+                tmp = f"{path}.{os.getpid()}.tmp"
+                f = None
+                try:
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    f = open(tmp, "wb")
+                    f.write(data)
+                    staged.append((f, tmp, path, links, future))
+                except Exception as e:
+                    self.fail(future, f"write {path}", e)
+                    self.discard(f, tmp)
+        synced = []
+        with self.trace.span("fsync"):
+            for f, tmp, path, links, future in staged:
+                if f is None:
+                    synced.append((tmp, path, links, future))
+                    continue
+                try:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+                    synced.append((tmp, path, links, future))
+                except Exception as e:
+                    self.fail(future, f"fsync {path}", e)
+                    self.discard(f, tmp)
+        dirs = set()
+        written = []
+        for tmp, path, links, future in synced:
+            try:
+                if tmp:
+                    os.replace(tmp, path)
+                views = []
+                for link in links:
+                    views.append(place_link(path, link))
+                    if views[-1] != link:
+                        self.errors.append(f"link {link}: hardlinks unsupported, image kept at {path}")
+                    dirs.add(os.path.dirname(link) or ".")
+                dirs.add(os.path.dirname(path) or ".")
+                written.append((future, views[0] if views else path))
+            except Exception as e:
+                self.fail(future, f"rename {path}", e)
+                if tmp:
+                    self.discard(None, tmp)
+        with self.trace.span("fsync"):
+            for d in dirs:
+                try:
+                    fd = os.open(d, os.O_RDONLY)
+                    try:
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+                except Exception:
+                    pass  # directories can't be fsynced on every platform
+        for future, view in written:
+            future.set_result(view)
+
+    def fail(self, future, what, error):
+        self.errors.append(f"{what}: {error}")
+        future.set_exception(error)
+
+    @staticmethod
+    def discard(f, tmp):
+        """Closes and removes a half-written temp file."""
+        try:
+            if f is not None:
+                f.close()
+        except Exception:
+            pass
+        try:
+            os.remove(tmp)
+        except Exception:
+            pass
+
+
+def make_thumbnail(img, original_path, size=220, writer=None):
+    """Thumbnail from an already-decoded image; with a DiskWriter the save is queued too."""
+    tpath = thumb_path(original_path)
     try:
-        response, retries = request_with_retry(session, url, max_retries=3)
+        if os.path.exists(tpath):
+            return tpath
+        thumb = img.copy()
+        thumb.thumbnail((size, size))
+        if writer is None:
+            thumb.save(tpath)
+            return tpath
+        buf = BytesIO()
+        thumb.save(buf, format=img.format or "PNG")
+        writer.write(tpath, buf.getvalue(), optional=True)
+        return tpath
+    except Exception:
+        return None
+
+
+def check_filters(width, height, img_format, min_size, allow_types, orientation):
+    if width < min_size[0] or height < min_size[1]:
+        return "low_res"
+    if orientation != "Any" and image_orientation(width, height) != orientation:
+        return "wrong_orientation"
+    if img_format.lower() not in allow_types:
+        return "type_filtered"
+    return None
+
+
+class PackedHashes:
+    """64-bit perceptual hashes packed into a numpy array, scanned in one vectorised pass."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = np.zeros(1024, dtype=np.uint64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, phash):
+        with self.lock:
+            if self.size == len(self.values):
+                self.values = np.concatenate([self.values, np.zeros_like(self.values)])
+            self.values[self.size] = int(str(phash), 16)
+            self.size += 1
+
+    def near(self, phash, threshold=5):
+        diff = self.values[: self.size] ^ np.uint64(int(str(phash), 16))
+        if hasattr(np, "bitwise_count"):
+            distances = np.bitwise_count(diff)
+        else:
+            distances = np.unpackbits(diff.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+        return bool((distances <= threshold).any())
+
+
+class SpillSet:
+    """Set of strings kept in an on-disk SQLite table rather than in memory.
+
+    By default the table is scratch state for one run and starts empty. A `persist`
+    set keeps its existing rows; a `shared` one also uses the default rollback
+    journal, so several processes or nodes can dedupe against one file on a shared disk.
+    """
+
+    def __init__(self, path, table, persist=False, shared=False):
+        self.lock = threading.Lock()
+        self.table = table
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        if not shared:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(f"PRAGMA synchronous={'NORMAL' if persist else 'OFF'}")
+        if not (persist or shared):
+            self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (k TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def __contains__(self, key):
+        with self.lock:
+            return self.conn.execute(f"SELECT 1 FROM {self.table} WHERE k = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def __iter__(self):
+        last = ""
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT k FROM {self.table} WHERE k > ? ORDER BY k LIMIT 10000", (last,)
+                ).fetchall()
+            if not rows:
+                return
+            for (key,) in rows:
+                yield key
+            last = rows[-1][0]
+
+    def add(self, key):
+        with self.lock:
+            self.conn.execute(f"INSERT OR IGNORE INTO {self.table} (k) VALUES (?)", (key,))
+
+    def claim(self, key):
+        """Adds `key`, returning False if it was already present."""
+        with self.lock:
+            return self.conn.execute(f"INSERT OR IGNORE INTO {self.table} (k) VALUES (?)", (key,)).rowcount == 1
+
+    def discard(self, key):
+        with self.lock:
+            self.conn.execute(f"DELETE FROM {self.table} WHERE k = ?", (key,))
+
+    def update(self, keys):
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(f"INSERT OR IGNORE INTO {self.table} (k) VALUES (?)", ((k,) for k in keys))
+            self.conn.execute("COMMIT")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+_digest_lock = threading.Lock()
+
+
+def claim_digest(digests, digest):
+    """Adds `digest` to `digests` unless present; True when this caller claimed it."""
+    if isinstance(digests, SpillSet):
+        return digests.claim(digest)
+    with _digest_lock:
+        if digest in digests:
+            return False
+        digests.add(digest)
+        return True
+
+
+def is_near_duplicate(phash, hash_list):
+    if isinstance(hash_list, PackedHashes):
+        return hash_list.near(phash)
+    return any((phash - h) <= 5 for h in hash_list)
+
+
+def fast_download(session, url, folder, name, min_size, min_bytes, allow_types, orientation, hash_list, digests=None, digest_index=None, trace=NO_TRACE, thumbnail=False, writer=None):
+    try:
+        response, retries = request_with_retry(session, url, max_retries=3, trace=trace)
         if response.status_code != 200:
             return None, "bad_status", retries
-        if len(response.content) < min_bytes:
+        content = response.content
+        if len(content) < min_bytes:
             return None, "too_small", retries
 
-        img = Image.open(BytesIO(response.content))
-        img.verify()
-        img = Image.open(BytesIO(response.content))
-
-        if img.size[0] < min_size[0] or img.size[1] < min_size[1]:
-            return None, "low_res", retries
-        if orientation != "Any" and image_orientation(img.size[0], img.size[1]) != orientation:
-            return None, "wrong_orientation", retries
+        # Exact duplicates are rejected before any decoding.
+        with trace.span("digest"):
+            digest = hashlib.sha256(content).hexdigest()
+        # Claimed atomically so identical bytes fetched concurrently are decoded once.
+        # Filter and decode rejections keep the claim, since every copy would fail the
+        # same way; only unexpected errors release it for a later copy to retry.
+        if digests is not None and not claim_digest(digests, digest):
+            return None, "exact_duplicate", retries
+        try:
+            meta, reason = accept_content(
+                content, digest, url, folder, name, min_size, allow_types, orientation,
+                hash_list, digest_index, trace, thumbnail, writer,
+            )
+        except Exception:
+            meta, reason = None, "error"
+        if reason == "error" and digests is not None:
+            digests.discard(digest)
+        return meta, reason, retries
+    except Exception:
+        return None, "error", 0
 
-        img_format = (img.format or "JPEG").upper()
-        ext = ".jpg" if img_format == "JPEG" else f".{img_format.lower()}"
-        if img_format.lower() not in allow_types:
-            return None, "type_filtered", retries
 
-        phash = None
-        if IMAGEHASH_AVAILABLE:
-            phash = imagehash.phash(img)
-            if any((phash - h) <= 5 for h in hash_list):
-                return None, "perceptual_duplicate", retries
+def accept_content(content, digest, url, folder, name, min_size, allow_types, orientation, hash_list, digest_index, trace, thumbnail, writer):
+    """Filters, dedupes and stores fetched bytes; returns (meta, reason)."""
+    stored = digest_index.get(digest) if digest_index is not None else None
+    if stored and os.path.exists(stored.get("object", "")):
+        reason = check_filters(stored["width"], stored["height"], stored["format"], min_size, allow_types, orientation)
+        if reason:
+            return None, reason
+        if IMAGEHASH_AVAILABLE and stored.get("hash"):
+            phash = imagehash.hex_to_hash(stored["hash"])
+            if is_near_duplicate(phash, hash_list):
+                return None, "perceptual_duplicate"
             hash_list.append(phash)
+        ext = os.path.splitext(stored["object"])[1]
         path = os.path.join(folder, name + ext)
-        with open(path, "wb") as f:
-            f.write(response.content)
-
         meta = {
             "url": url,
+            "format": stored["format"],
+            "width": stored["width"],
+            "height": stored["height"],
+            "bytes": len(content),
+            "hash": stored.get("hash", ""),
+            "sha256": digest,
+            "object": stored["object"],
+            "path": path,
+        }
+        if thumbnail:
+            with trace.span("thumbnail"):
+                meta["thumb"] = make_thumbnail(Image.open(BytesIO(content)), path, writer=writer)
+        with trace.span("disk_enqueue" if writer is not None else "disk_write"):
+            stored_at = store_file(stored["object"], content, [path], writer)
+        return with_stored_path(meta, stored_at), "ok"
+
+    try:
+        with trace.span("decode"):
+            img = Image.open(BytesIO(content))
+            img.verify()
+            img = Image.open(BytesIO(content))
+    except Exception:
+        return None, "decode_error"
+
+    img_format = (img.format or "JPEG").upper()
+    ext = ".jpg" if img_format == "JPEG" else f".{img_format.lower()}"
+    reason = check_filters(img.size[0], img.size[1], img_format, min_size, allow_types, orientation)
+    if reason:
+        return None, reason
+
+    phash = None
+    if IMAGEHASH_AVAILABLE:
+        with trace.span("phash"):
+            phash = imagehash.phash(img)
+            duplicate = is_near_duplicate(phash, hash_list)
+        if duplicate:
+            return None, "perceptual_duplicate"
+        hash_list.append(phash)
+
+    path = os.path.join(folder, name + ext)
+    thumb = None
+    if thumbnail:
+        # Queued ahead of the image, so it is on disk by the time the image is reported.
+        with trace.span("thumbnail"):
+            thumb = make_thumbnail(img, path, writer=writer)
+    object_path = ""
+    with trace.span("disk_enqueue" if writer is not None else "disk_write"):
+        if digest_index is not None:
+            object_path = cas_object_path(folder, digest, ext)
+            stored_at = store_file(object_path, content, [path], writer)
+        else:
+            stored_at = store_file(path, content, (), writer)
+    if digest_index is not None:
+        digest_index[digest] = {
+            "object": object_path,
             "format": img_format,
             "width": img.size[0],
             "height": img.size[1],
-            "bytes": len(response.content),
             "hash": str(phash) if phash is not None else "",
-            "path": path,
         }
-        return meta, "ok", retries
-    except Exception:
-        return None, "error", 0
+
+    meta = {
+        "url": url,
+        "format": img_format,
+        "width": img.size[0],
+        "height": img.size[1],
+        "bytes": len(content),
+        "hash": str(phash) if phash is not None else "",
+        "sha256": digest,
+        "object": object_path,
+        "path": path,
+    }
+    if thumbnail:
+        meta["thumb"] = thumb
+    return with_stored_path(meta, stored_at), "ok"
+
+
+def with_stored_path(meta, stored_at):
+    """Points `meta` at where the image was stored, or at the pending DiskWriter write."""
+    if isinstance(stored_at, concurrent.futures.Future):
+        meta["_write"] = stored_at
+    else:
+        meta["path"] = stored_at
+    return meta
 
 
 def create_zip(file_paths):
@@ -509,17 +1636,102 @@ def create_zip(file_paths):
     return buf.getvalue()
 
 
+def metadata_fieldnames(rows):
+    """Union of keys across all rows, in first-seen order."""
+    fields = {}
+    for row in rows:
+        for k in row:
+            fields.setdefault(k, None)
+    return list(fields)
+
+
 def metadata_to_csv(metadata):
     if not metadata:
         return ""
     output = StringIO()
-    writer = csv.DictWriter(output, fieldnames=list(metadata[0].keys()))
+    writer = csv.DictWriter(output, fieldnames=metadata_fieldnames(metadata))
     writer.writeheader()
     for row in metadata:
         writer.writerow(row)
     return output.getvalue()
 
 
+EXPORT_FORMATS = {
+    "JSON": ("metadata.json", "application/json"),
+    "JSONL": ("metadata.jsonl", "application/x-ndjson"),
+    "CSV": ("metadata.csv", "text/csv"),
+    "Parquet": ("metadata.parquet", "application/vnd.apache.parquet"),
+}
+
+
+def parquet_column_types(fields):
+    """Arrow type per field: int/float/bool when every value agrees, otherwise string."""
+    seen = {f: set() for f in fields}
+    for row in iter_metadata():
+        for f in fields:
+            v = row.get(f)
+            if v is not None:
+                seen[f].add(type(v))
+    types = {}
+    for f, kinds in seen.items():
+        if kinds == {bool}:
+            types[f] = pa.bool_()
+        elif kinds and kinds <= {int}:
+            types[f] = pa.int64()
+        elif kinds and kinds <= {int, float}:
+            types[f] = pa.float64()
+        else:
+            types[f] = pa.string()
+    return types
+
+
+def export_metadata(fmt, chunk_rows=10000):
+    """Writes the persisted metadata to EXPORT_DIR in `fmt`, streaming row by row.
+
+    Every format uses the same schema: the union of fields across all rows, with
+    missing values left empty. Returns the export path.
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, EXPORT_FORMATS[fmt][0])
+    fields = metadata_fieldnames(iter_metadata())
+    if fmt == "JSON":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for i, row in enumerate(iter_metadata()):
+                f.write(",\n" if i else "\n")
+                json.dump({k: row.get(k) for k in fields}, f)
+            f.write("\n]\n")
+    elif fmt == "JSONL":
+        with open(path, "w", encoding="utf-8") as f:
+            for row in iter_metadata():
+                f.write(json.dumps({k: row.get(k) for k in fields}) + "\n")
+    elif fmt == "CSV":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for row in iter_metadata():
+                writer.writerow(row)
+    elif fmt == "Parquet":
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("pyarrow is not installed; Parquet export is unavailable.")
+        types = parquet_column_types(fields)
+        schema = pa.schema([(f, types[f]) for f in fields])
+        casts = {pa.int64(): int, pa.float64(): float, pa.bool_(): bool}
+        with pq.ParquetWriter(path, schema) as writer:
+            chunk = []
+            for row in itertools.chain(iter_metadata(), [None]):
+                if row is not None:
+                    chunk.append(row)
+                if chunk and (row is None or len(chunk) >= chunk_rows):
+                    columns = {}
+                    for f in fields:
+                        cast = casts.get(types[f], str)
+                        columns[f] = [None if r.get(f) is None else cast(r.get(f)) for r in chunk]
+                    writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                    chunk = []
+    return path
+
+
 def url_map(query, source):
     encoded = quote(query)
     dashed = query.replace(" ", "-")
@@ -536,6 +1748,586 @@ def url_map(query, source):
     }[source]
 
 
+def new_skipped():
+    return {
+        "bad_status": 0,
+        "too_small": 0,
+        "low_res": 0,
+        "wrong_orientation": 0,
+        "type_filtered": 0,
+        "exact_duplicate": 0,
+        "perceptual_duplicate": 0,
+        "decode_error": 0,
+        "write_error": 0,
+        "error": 0,
+    }
+
+
+def scrape_sources(driver, session, query, sources, num, out_dir, settings, state, downloaded=0, on_accept=None, trace=NO_TRACE):
+    """Scroll, extract and download from each source until `num` images are accepted.
+
+    `settings` holds the quality/rate options chosen in the UI, `state` the dedupe
+    structures shared across sources (found, hash_list, digests, digest_index,
+    source_stats). Each accepted image's metadata is passed to `on_accept(meta, downloaded)`
+    once its file is on disk. Stage timings are recorded on `trace`; image files go
+    through a DiskWriter that is drained before returning.
+    """
+    stats = {
+        "downloaded": downloaded,
+        "attempted": 0,
+        "skipped": new_skipped(),
+        "retried": 0,
+        "total_requests": 0,
+    }
+    writer = DiskWriter(trace).start()
+    gauges = {"pending": RunGauge("ultra_scraper_downloads_pending")}
+    try:
+        scrape_into(driver, session, query, sources, num, out_dir, settings, state, stats, writer, on_accept, trace, gauges)
+    finally:
+        writer.close()
+        for gauge in gauges.values():
+            gauge.clear()
+    if writer.errors:
+        stats["write_errors"] = writer.errors[:50]
+    return stats
+
+
+def scrape_into(driver, session, query, sources, num, out_dir, settings, state, stats, writer, on_accept, trace, gauges):
+    """Body of scrape_sources; updates `stats` in place and this run's `gauges`."""
+    found = state["found"]
+    source_stats = state["source_stats"]
+    min_res = settings["min_res"]
+    allow_types = [t.lower() for t in settings["allow_types"]]
+    max_workers = 8 if settings["turbo"] else 1
+    max_scrolls = settings.get("max_scrolls", 40)
+    downloaded = stats["downloaded"]
+    name_seq = itertools.count(downloaded)
+    # Accepted images whose bytes are still queued on the writer. `downloaded` counts
+    # them towards the budget; a failed write takes them back out.
+    unsettled = []
+
+    def settle(wait):
+        nonlocal downloaded
+        pending = []
+        for meta, write in unsettled:
+            if write is not None:
+                if not (wait or write.done()):
+                    pending.append((meta, write))
+                    continue
+                try:
+                    meta["path"] = write.result()
+                except Exception:
+                    downloaded -= 1
+                    if state["digests"] is not None:
+                        state["digests"].discard(meta["sha256"])
+                    stats["skipped"]["write_error"] += 1
+                    METRICS.inc("ultra_scraper_skipped_total", source=meta["source"], reason="write_error")
+                    continue
+            METRICS.inc("ultra_scraper_downloads_total", source=meta["source"])
+            stats["downloaded"] += 1
+            if on_accept:
+                with trace.span("ui_update"):
+                    on_accept(meta, stats["downloaded"])
+        unsettled[:] = pending
+
+    for source in sources:
+        if downloaded >= num:
+            break
+
+        with trace.span("driver_get"):
+            driver.get(url_map(query, source))
+        with trace.span("page_wait"):
+            time.sleep(settings.get("page_wait", 2))
+
+        queue = []
+        depth = gauges.setdefault(source, RunGauge("ultra_scraper_queue_depth", source=source))
+        scroll_i = 0
+        dry_scrolls = 0
+        while downloaded < num:
+            queued_before = len(queue)
+            with trace.span("webdriver_extract"):
+                candidates = extract_image_urls(driver, source)
+            for src, width in candidates:
+                if settings["unlock"]:
+                    resolved = resolve_high_res(src, source)
+                    if resolved != src:
+                        # The srcset width described the thumbnail, not the resolved original.
+                        src, width = resolved, 0
+                if src not in found and is_valid_image_url(src):
+                    found.add(src)
+                    push_candidate(queue, src, source, width, min_res[0], source_stats)
+            page_urls = []
+            if scroll_i == 0 or not candidates:
+                # The full HTML (with any embedded JSON) is read on arrival and again only
+                # once the DOM stops yielding new images; a growing page would otherwise
+                # be re-sent on every scroll.
+                with trace.span("page_source"):
+                    page_urls = extract_from_page_source(driver.page_source, source)
+            for src in page_urls:
+                if settings["unlock"]:
+                    src = resolve_high_res(src, source)
+                if src not in found and is_valid_image_url(src):
+                    found.add(src)
+                    push_candidate(queue, src, source, 0, min_res[0], source_stats)
+            depth.set(len(queue))
+            dry_scrolls = 0 if len(queue) > queued_before else dry_scrolls + 1
+
+            # Unlikely candidates wait for later scrolls; the last scroll drains the queue.
+            # Without a scroll cap, the source counts as exhausted after a few dry scrolls.
+            if max_scrolls is None:
+                last_scroll = dry_scrolls >= EXHAUSTED_AFTER
+            else:
+                last_scroll = scroll_i == max_scrolls - 1
+            while queue and downloaded < num:
+                batch = pop_candidates(queue, min(num - downloaded, BATCH_LIMIT), 0.0 if last_scroll else DEFER_BELOW)
+                if not batch:
+                    break
+                depth.set(len(queue))
+                gauges["pending"].set(len(batch))
+                with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download") as exe:
+                    future_map = {}
+                    for u, bucket in batch:
+                        name = f"{slugify(query)}_{source.lower()}_{int(time.time())}_{next(name_seq)}"
+                        future_map[exe.submit(
+                            run_timed,
+                            fast_download,
+                            session,
+                            u,
+                            out_dir,
+                            name,
+                            min_res,
+                            settings["min_bytes"],
+                            allow_types,
+                            settings["orientation"],
+                            state["hash_list"],
+                            state["digests"],
+                            state["digest_index"],
+                            trace,
+                            settings.get("preview", False),
+                            writer,
+                        )] = bucket
+
+                    for f in concurrent.futures.as_completed(future_map):
+                        stats["attempted"] += 1
+                        (meta, reason, retries), elapsed = f.result()
+                        stats["retried"] += retries
+                        stats["total_requests"] += 1
+                        record_outcome(source_stats, source, min_res[0], future_map[f], meta is not None)
+                        gauges["pending"].add(-1)
+                        METRICS.observe("ultra_scraper_image_seconds", elapsed, source=source)
+                        accepted, tried = map(sum, zip(*source_stats[source][str(min_res[0])].values()))
+                        METRICS.set("ultra_scraper_source_acceptance_ratio", round(accepted / tried, 4), source=source)
+                        if meta:
+                            downloaded += 1
+                            meta.update(
+                                {
+                                    "query": query,
+                                    "source": source,
+                                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                                }
+                            )
+                            unsettled.append((meta, meta.pop("_write", None)))
+                        else:
+                            stats["skipped"][reason] = stats["skipped"].get(reason, 0) + 1
+                            METRICS.inc("ultra_scraper_skipped_total", source=source, reason=reason)
+                        settle(False)
+                # The budget check below needs to know which of this batch really landed.
+                settle(True)
+
+            if last_scroll:
+                break
+            with trace.span("scroll"):
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            with trace.span("scroll_sleep"):
+                time.sleep(scroll_delay(source, settings["rate_mode"]))
+            scroll_i += 1
+        # Whatever is left in the queue is abandoned with this source.
+        depth.clear()
+
+
+class WorkQueue:
+    """Query x source tasks in a SQLite file shared by worker processes or nodes.
+
+    A worker leases a task for `lease_sec` and renews the lease while it scrapes; a
+    task whose lease runs out (the worker died) is handed to the next worker that
+    asks. The same file records every accepted image so the coordinator can report
+    aggregate throughput. Another backend (e.g. a Redis list) only needs the same
+    enqueue/lease/renew/complete/fail/summary methods.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                query TEXT, source TEXT, num INTEGER, settings TEXT,
+                status TEXT DEFAULT 'pending', worker TEXT, lease_until REAL,
+                attempts INTEGER DEFAULT 0, stats TEXT, error TEXT, updated REAL
+            );
+            CREATE TABLE IF NOT EXISTS images (
+                id INTEGER PRIMARY KEY, task_id INTEGER, worker TEXT, meta TEXT, ts REAL
+            );
+            CREATE TABLE IF NOT EXISTS digests (k TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS digest_claims (k TEXT PRIMARY KEY, task_id INTEGER, worker TEXT) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_until);
+            CREATE INDEX IF NOT EXISTS images_ts ON images (ts);
+            CREATE INDEX IF NOT EXISTS images_task ON images (task_id);
+            CREATE INDEX IF NOT EXISTS digest_claims_task ON digest_claims (task_id, worker);
+            """
+        )
+
+    def enqueue(self, queries, sources, num, settings):
+        rows = [(q, s, num, json.dumps(settings), time.time()) for q in queries for s in sources]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT INTO tasks (query, source, num, settings, updated) VALUES (?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def lease(self, worker, lease_sec=LEASE_SEC):
+        """Claims the oldest pending or expired task.
+
+        An expired task's digest claims from its dead worker are released first, and
+        `downloaded` carries the images already recorded for it. Returns None once the
+        queue is drained, and an empty dict while the only unfinished tasks are leased
+        by other workers.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self.conn.execute(
+                        "SELECT id, query, source, num, settings, attempts, status, worker FROM tasks "
+                        "WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) "
+                        "ORDER BY id LIMIT 1",
+                        (now,),
+                    ).fetchone()
+                    if row and row[6] == "leased":
+                        self.release_claims(row[0], row[7])
+                    if not row or row[5] < MAX_ATTEMPTS:
+                        break
+                    self.conn.execute(
+                        "UPDATE tasks SET status = 'failed', error = 'lease expired', updated = ? WHERE id = ?",
+                        (now, row[0]),
+                    )
+                downloaded = 0
+                if row:
+                    self.conn.execute(
+                        "UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, "
+                        "attempts = attempts + 1, updated = ? WHERE id = ?",
+                        (worker, now + lease_sec, now, row[0]),
+                    )
+                    downloaded = self.conn.execute("SELECT COUNT(*) FROM images WHERE task_id = ?", (row[0],)).fetchone()[0]
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None if self.outstanding() == 0 else {}
+        task_id, query, source, num, settings = row[:5]
+        return {
+            "id": task_id,
+            "query": query,
+            "source": source,
+            "num": num,
+            "settings": json.loads(settings),
+            "downloaded": downloaded,
+        }
+
+    def release_claims(self, task_id, worker):
+        """Drops `worker`'s digest claims for `task_id` that never became a recorded image.
+
+        Deterministic rejections are released too; the next worker just fetches them again.
+        """
+        self.conn.execute(
+            "DELETE FROM digests WHERE k IN (SELECT k FROM digest_claims WHERE task_id = ? AND worker = ?) "
+            "AND k NOT IN (SELECT json_extract(meta, '$.sha256') FROM images "
+            "WHERE task_id = ? AND json_extract(meta, '$.sha256') IS NOT NULL)",
+            (task_id, worker, task_id),
+        )
+        self.conn.execute("DELETE FROM digest_claims WHERE task_id = ? AND worker = ?", (task_id, worker))
+
+    def renew(self, task_id, worker, lease_sec=LEASE_SEC):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + lease_sec, task_id, worker),
+            )
+
+    def complete(self, task_id, worker, stats):
+        """Marks the task done; its digest claims become permanent."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                done = self.conn.execute(
+                    "UPDATE tasks SET status = 'done', stats = ?, updated = ? WHERE id = ? AND worker = ?",
+                    (json.dumps(stats, default=str), time.time(), task_id, worker),
+                ).rowcount
+                if done:
+                    self.conn.execute("DELETE FROM digest_claims WHERE task_id = ? AND worker = ?", (task_id, worker))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def fail(self, task_id, worker, error):
+        """Returns the task to the queue until it has used up MAX_ATTEMPTS leases."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                failed = self.conn.execute(
+                    "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                    "error = ?, updated = ? WHERE id = ? AND worker = ?",
+                    (MAX_ATTEMPTS, error, time.time(), task_id, worker),
+                ).rowcount
+                if failed:
+                    self.release_claims(task_id, worker)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def record_image(self, task_id, worker, meta):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO images (task_id, worker, meta, ts) VALUES (?, ?, ?, ?)",
+                (task_id, worker, json.dumps(meta), time.time()),
+            )
+
+    def outstanding(self):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased')"
+            ).fetchone()[0]
+
+    def summary(self, window=60):
+        """Task counts, per-worker totals and images/sec overall and over the last `window` seconds."""
+        now = time.time()
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            total, first, last = self.conn.execute("SELECT COUNT(*), MIN(ts), MAX(ts) FROM images").fetchone()
+            recent = self.conn.execute("SELECT COUNT(*) FROM images WHERE ts > ?", (now - window,)).fetchone()[0]
+            workers = self.conn.execute(
+                "SELECT worker, COUNT(*), MAX(ts) FROM images GROUP BY worker ORDER BY worker"
+            ).fetchall()
+            active = dict(
+                self.conn.execute(
+                    "SELECT worker, COUNT(*) FROM tasks WHERE status = 'leased' AND lease_until >= ? GROUP BY worker",
+                    (now,),
+                ).fetchall()
+            )
+        span = (last - first) if total > 1 else 0
+        return {
+            "tasks": counts,
+            "images": total,
+            "rate": round(total / span, 2) if span else 0.0,
+            "recent_rate": round(recent / window, 2),
+            "workers": [
+                {"worker": w, "images": n, "last_seen_sec": round(now - ts), "leased": active.get(w, 0)}
+                for w, n, ts in workers
+            ],
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class SharedHashes(PackedHashes):
+    """PackedHashes mirrored into a table of the shared queue file.
+
+    Each worker scans its local copy; `refresh()` pulls hashes other workers have
+    added since the last call, so cross-node near-duplicates are caught from the
+    next task on.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.db_lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS phashes (id INTEGER PRIMARY KEY, v TEXT)")
+        self.seen = 0
+        self.own = set()
+        self.refresh()
+
+    def append(self, phash):
+        super().append(phash)
+        with self.db_lock:
+            self.own.add(self.conn.execute("INSERT INTO phashes (v) VALUES (?)", (str(phash),)).lastrowid)
+
+    def refresh(self):
+        with self.db_lock:
+            rows = self.conn.execute("SELECT id, v FROM phashes WHERE id > ? ORDER BY id", (self.seen,)).fetchall()
+        for row_id, value in rows:
+            if row_id not in self.own:
+                super().append(value)
+            self.seen = row_id
+
+    def close(self):
+        with self.db_lock:
+            self.conn.close()
+
+
+class TaskFound:
+    """Discovery dedupe for one task: URLs seen by this task plus those any worker accepted.
+
+    Only accepted URLs are shared. A task re-leased after its worker died, or one
+    overlapping an earlier task, can still download candidates that were seen but
+    never accepted.
+    """
+
+    def __init__(self, accepted):
+        self.seen = set()
+        self.accepted = accepted
+
+    def __contains__(self, url):
+        return url in self.seen or url in self.accepted
+
+    def add(self, url):
+        self.seen.add(url)
+
+
+class ClaimedDigests(SpillSet):
+    """The queue file's shared digest set, with each claim tagged by task and worker.
+
+    A worker that dies between claiming a digest and recording the image would
+    otherwise block that image for every other worker; WorkQueue releases such
+    claims when it hands the task out again. Set `task_id` before each task.
+    """
+
+    def __init__(self, path, worker):
+        super().__init__(path, "digests", persist=True, shared=True)
+        self.worker = worker
+        self.task_id = None
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS digest_claims (k TEXT PRIMARY KEY, task_id INTEGER, worker TEXT) WITHOUT ROWID"
+        )
+
+    def claim(self, key):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                claimed = self.conn.execute("INSERT OR IGNORE INTO digests (k) VALUES (?)", (key,)).rowcount == 1
+                if claimed:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO digest_claims (k, task_id, worker) VALUES (?, ?, ?)",
+                        (key, self.task_id, self.worker),
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def discard(self, key):
+        with self.lock:
+            self.conn.execute("DELETE FROM digests WHERE k = ?", (key,))
+            self.conn.execute("DELETE FROM digest_claims WHERE k = ?", (key,))
+
+
+def run_worker(queue_path, worker_id, out_dir, lease_sec=LEASE_SEC, idle_sleep=5):
+    """Leases tasks from the shared queue and scrapes each until no work is left.
+
+    One Chromium is reused across tasks. Accepted URLs, digests and phashes go
+    through the queue file so every worker skips what any other has already accepted.
+    """
+    work = WorkQueue(queue_path)
+    driver = setup_driver()
+    if not driver:
+        print("ChromeDriver not available. Check your browser driver setup.", file=sys.stderr)
+        return 1
+    os.makedirs(out_dir, exist_ok=True)
+    session = requests.Session()
+    accepted = SpillSet(queue_path, "urls", persist=True, shared=True)
+    state = {
+        "hash_list": SharedHashes(queue_path) if IMAGEHASH_AVAILABLE else [],
+        "digests": ClaimedDigests(queue_path, worker_id),
+        "digest_index": None,
+        "source_stats": load_source_stats(),
+    }
+    METRICS.inc("ultra_scraper_drivers_in_use")
+    try:
+        while True:
+            task = work.lease(worker_id, lease_sec)
+            if task is None:
+                break
+            if not task:
+                # Everything left is leased by other workers; wait in case one dies.
+                time.sleep(idle_sleep)
+                continue
+            state["found"] = TaskFound(accepted)
+            state["digests"].task_id = task["id"]
+            if IMAGEHASH_AVAILABLE:
+                state["hash_list"].refresh()
+            stop = threading.Event()
+
+            def on_accept(meta, downloaded, task_id=task["id"]):
+                work.record_image(task_id, worker_id, meta)
+                if meta.get("url"):
+                    accepted.add(meta["url"])
+
+            def keep_lease(task_id=task["id"]):
+                while not stop.wait(lease_sec / 3):
+                    work.renew(task_id, worker_id, lease_sec)
+
+            renewer = threading.Thread(target=keep_lease, name="lease", daemon=True)
+            renewer.start()
+            settings = dict(task["settings"], preview=False)
+            settings["min_res"] = tuple(settings["min_res"])
+            METRICS.inc("ultra_scraper_runs_total")
+            METRICS.inc("ultra_scraper_runs_active")
+            try:
+                started = time.time()
+                stats = scrape_sources(
+                    driver,
+                    session,
+                    task["query"],
+                    [task["source"]],
+                    task["num"] or math.inf,
+                    out_dir,
+                    settings,
+                    state,
+                    downloaded=task["downloaded"],
+                    on_accept=on_accept,
+                )
+                stats["duration_sec"] = round(time.time() - started, 1)
+                work.complete(task["id"], worker_id, stats)
+                print(f"[{worker_id}] {task['query']} / {task['source']}: {stats['downloaded']} downloaded")
+            except Exception as e:
+                work.fail(task["id"], worker_id, str(e))
+                print(f"[{worker_id}] {task['query']} / {task['source']} failed: {e}", file=sys.stderr)
+            finally:
+                stop.set()
+                renewer.join()
+                METRICS.inc("ultra_scraper_runs_active", -1)
+    finally:
+        driver.quit()
+        METRICS.inc("ultra_scraper_drivers_in_use", -1)
+        save_source_stats(state["source_stats"])
+        accepted.close()
+        state["digests"].close()
+        if IMAGEHASH_AVAILABLE:
+            state["hash_list"].close()
+        work.close()
+    return 0
+
+
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
+if METRICS_TEXTFILE:
+    start_metrics_textfile(METRICS_TEXTFILE)
+
+if CLI_ARGS.worker:
+    sys.exit(run_worker(CLI_ARGS.queue, CLI_ARGS.worker_id, CLI_ARGS.out, CLI_ARGS.lease_sec))
+
+def reset_state(key, value=None):
+    """on_click callback that drops a prepared download once it has been served."""
+    st.session_state[key] = value
+
+
 # Session State
 if "files" not in st.session_state:
     st.session_state.files = []
@@ -553,6 +2345,12 @@ if "out_dir" not in st.session_state:
     st.session_state.out_dir = os.path.join(os.path.expanduser("~"), "Downloads", "UltraScraper")
 if "last_stats" not in st.session_state:
     st.session_state.last_stats = {}
+if "export" not in st.session_state:
+    st.session_state.export = None
+if "large_run" not in st.session_state:
+    st.session_state.large_run = None
+if "trace_download" not in st.session_state:
+    st.session_state.trace_download = False
 
 # Header
 st.markdown(
@@ -604,7 +2402,10 @@ with st.container():
         value=st.session_state.query,
         placeholder="e.g. Romantic Aesthetic",
     )
-    num = st.slider("Image count", 5, 200, 40)
+    if st.session_state.get("large_run_mode"):
+        st.caption("Image count is set by the large run budget in Advanced settings.")
+    else:
+        num = st.slider("Image count", 5, 200, 40)
 
 # Quick Chips
 q_chips = ["Romantic", "Dark Aesthetic", "Minimal", "Nature", "Space", "Lo-Fi"]
@@ -649,6 +2450,30 @@ with st.expander("Advanced settings"):
     resume_last = st.checkbox("Resume last run (skip already downloaded)", value=False)
     use_url_cache = st.checkbox("Use URL cache across sessions", value=True)
     rate_mode = st.selectbox("Rate limit", ["Normal", "Gentle", "Aggressive"], index=0)
+    profile_run = st.checkbox(
+        "Profile this run",
+        value=CLI_ARGS.profile,
+        help="Sample every thread's stack and save a flamegraph-ready profile next to last_errors.txt",
+    )
+    export_trace = st.checkbox(
+        "Record run trace",
+        value=CLI_ARGS.trace,
+        help="Save a Chrome/Perfetto trace of every stage and worker thread",
+    )
+    large_run = st.checkbox(
+        "Large run mode",
+        value=False,
+        key="large_run_mode",
+        help="Keep run state on disk so runs of 10k-100k images use flat memory",
+    )
+    if large_run:
+        budget = st.number_input("Image budget (0 = until sources are exhausted)", min_value=0, value=1000, step=100)
+        num = int(budget) or math.inf
+    cas_storage = st.checkbox(
+        "Content-addressed storage",
+        value=False,
+        help="Store each unique file once under objects/ and hardlink query views to it",
+    )
 
     st.caption("High-res filtering + dedupe improves quality but can reduce total downloads.")
 
@@ -663,13 +2488,13 @@ with st.expander("Maintenance"):
                 st.warning("History not found.")
     with m2:
         if st.button("Clear URL cache"):
-            if clear_file(URL_CACHE_PATH):
+            if clear_sqlite(URL_CACHE_PATH) | clear_file(LEGACY_URL_CACHE_PATH):
                 st.success("URL cache cleared.")
             else:
                 st.warning("URL cache not found.")
     with m3:
         if st.button("Clear metadata"):
-            if clear_file(META_PATH):
+            if clear_file(META_PATH) | clear_file(LEGACY_META_PATH):
                 st.success("Last metadata cleared.")
             else:
                 st.warning("Metadata not found.")
@@ -679,6 +2504,11 @@ with st.expander("Maintenance"):
             st.success(f"Removed {removed} files from downloads folder.")
         else:
             st.warning("Downloads folder not found.")
+    if st.button("Clear learned priorities"):
+        if clear_file(SOURCE_STATS_PATH):
+            st.success("Per-source acceptance stats cleared.")
+        else:
+            st.warning("No learned priorities found.")
     if st.button("Clear thumbnail cache"):
         ok, removed = clear_folder(THUMB_DIR)
         if ok:
@@ -686,6 +2516,57 @@ with st.expander("Maintenance"):
         else:
             st.warning("Thumbnail cache not found.")
 
+settings = {
+    "min_res": min_res,
+    "min_bytes": min_bytes,
+    "allow_types": allow_types,
+    "orientation": orientation,
+    "unlock": unlock,
+    "turbo": turbo,
+    "rate_mode": rate_mode,
+    "preview": preview,
+    "max_scrolls": None if large_run else 40,
+}
+
+with st.expander("Distributed mode"):
+    queue_path = st.text_input(
+        "Shared queue file",
+        value=QUEUE_PATH,
+        help="SQLite file on a disk every worker can reach; it also holds the shared dedupe store",
+    )
+    queue_queries = st.text_area("Queries (one per line)", value=query)
+    if st.button("Enqueue query x source tasks"):
+        queries = [q.strip() for q in queue_queries.splitlines() if q.strip()]
+        if not queries or not sources:
+            st.warning("Enter at least one query and select at least one source.")
+        else:
+            work = WorkQueue(queue_path)
+            added = work.enqueue(queries, sources, 0 if math.isinf(num) else num, settings)
+            work.close()
+            st.success(f"Queued {added} tasks.")
+    st.caption("Start workers on any machine that can reach the queue file:")
+    st.code(f'python streamlit_app.py --worker --queue "{queue_path}" --out <download folder>')
+    if os.path.exists(queue_path):
+        work = WorkQueue(queue_path)
+        summary = work.summary()
+        work.close()
+        tasks = summary["tasks"]
+        st.write(
+            f"Tasks: {tasks.get('pending', 0)} pending  -  {tasks.get('leased', 0)} leased  -  "
+            f"{tasks.get('done', 0)} done  -  {tasks.get('failed', 0)} failed"
+        )
+        st.write(
+            f"Images: {summary['images']}  -  {summary['rate']}/s overall  -  "
+            f"{summary['recent_rate']}/s over the last minute"
+        )
+        for w in summary["workers"]:
+            st.write(
+                f"{w['worker']}: {w['images']} images, {w['leased']} tasks leased, "
+                f"last image {w['last_seen_sec']}s ago"
+            )
+        if st.button("Refresh"):
+            st.rerun()
+
 # Run
 run_disabled = (not query.strip()) or (not sources)
 run_button = st.button("Start scraping", disabled=run_disabled)
@@ -706,163 +2587,171 @@ if run_button:
         st.session_state.files = []
         st.session_state.metadata = []
         st.session_state.errors = []
+        st.session_state.export = None
+        st.session_state.large_run = None
+        st.session_state.trace_download = False
 
         status = st.status(f"Scraping {', '.join(sources)}...", expanded=True)
         driver = setup_driver()
 
         if driver:
+            METRICS.inc("ultra_scraper_runs_total")
+            METRICS.inc("ultra_scraper_runs_active")
+            METRICS.inc("ultra_scraper_drivers_in_use")
             session = requests.Session()
-            found = set()
-            hash_list = []
-            url_cache = load_url_cache() if use_url_cache else set()
-            if url_cache:
-                found.update(url_cache)
-
+            if large_run:
+                # Dedupe sets live in SQLite and metadata streams to disk; session memory
+                # only keeps counts and the gallery page being viewed.
+                run_state_path = new_run_state_path()
+                state = {
+                    "found": SpillSet(run_state_path, "found"),
+                    "hash_list": PackedHashes() if IMAGEHASH_AVAILABLE else [],
+                    "digests": SpillSet(run_state_path, "digests"),
+                }
+                spill = MetadataSpill()
+            else:
+                state = {"found": set(), "hash_list": [], "digests": set()}
+                spill = None
+            state["digest_index"] = load_digest_index() if cas_storage else None
+            state["source_stats"] = load_source_stats()
+            url_cache = open_url_cache() if use_url_cache else None
+            if url_cache is not None:
+                state["found"].update(url_cache)
+
+            downloaded = 0
             if resume_last:
-                prior = load_last_metadata()
+                prior = iter_metadata() if spill else load_last_metadata()
                 for item in prior:
                     url = item.get("url")
                     if url:
-                        found.add(url)
+                        state["found"].add(url)
+                    if item.get("sha256"):
+                        state["digests"].add(item.get("sha256"))
                     hash_str = item.get("hash")
                     if hash_str and IMAGEHASH_AVAILABLE:
                         try:
-                            hash_list.append(imagehash.hex_to_hash(hash_str))
+                            state["hash_list"].append(imagehash.hex_to_hash(hash_str))
                         except Exception:
                             pass
-                st.session_state.metadata.extend(prior)
-                st.session_state.files.extend(
-                    [m.get("path") for m in prior if m.get("path") and os.path.exists(m.get("path"))]
-                )
-
-            downloaded = len([p for p in st.session_state.files if p])
-            attempted = 0
-            skipped = {
-                "bad_status": 0,
-                "too_small": 0,
-                "low_res": 0,
-                "wrong_orientation": 0,
-                "type_filtered": 0,
-                "perceptual_duplicate": 0,
-                "error": 0,
-            }
-            retried = 0
-            total_requests = 0
+                    if spill:
+                        spill.append(item)
+                        if item.get("path") and os.path.exists(item.get("path")):
+                            downloaded += 1
+                if not spill:
+                    st.session_state.metadata.extend(prior)
+                    st.session_state.files.extend(
+                        [m.get("path") for m in prior if m.get("path") and os.path.exists(m.get("path"))]
+                    )
+                    downloaded = len([p for p in st.session_state.files if p])
             run_started_at = time.time()
+            trace = RunTrace(keep_spans=export_trace)
+            profiler = SamplingProfiler().start() if profile_run else None
 
             try:
                 prog = status.progress(0, text="Starting...")
                 preview_area = st.empty() if preview else None
 
-                for source in sources:
-                    if downloaded >= num:
-                        break
-
-                    driver.get(url_map(query, source))
-                    time.sleep(2)
-
-                    max_scrolls = 40
-                    for _ in range(max_scrolls):
-                        if downloaded >= num:
-                            break
-
-                        batch_urls = []
-                        for src in extract_image_urls(driver, source):
-                            if unlock:
-                                src = resolve_high_res(src, source)
-                            if src not in found and is_valid_image_url(src):
-                                found.add(src)
-                                batch_urls.append(src)
-                        page_urls = extract_from_page_source(driver.page_source, source)
-                        for src in page_urls:
-                            if unlock:
-                                src = resolve_high_res(src, source)
-                            if src not in found and is_valid_image_url(src):
-                                found.add(src)
-                                batch_urls.append(src)
-
-                        if batch_urls:
-                            max_workers = 8 if turbo else 1
-                            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as exe:
-                                future_map = {}
-                                for i, u in enumerate(batch_urls):
-                                    if downloaded + len(future_map) >= num:
-                                        break
-                                    name = f"{slugify(query)}_{source.lower()}_{int(time.time())}_{downloaded+len(future_map)}"
-                                    future_map[exe.submit(
-                                        fast_download,
-                                        session,
-                                        u,
-                                        st.session_state.out_dir,
-                                        name,
-                                        min_res,
-                                        min_bytes,
-                                        [t.lower() for t in allow_types],
-                                        orientation,
-                                        hash_list,
-                                    )] = u
-
-                                for f in concurrent.futures.as_completed(future_map):
-                                    attempted += 1
-                                    meta, reason, retries = f.result()
-                                    retried += retries
-                                    total_requests += 1
-                                    if meta:
-                                        downloaded += 1
-                                        meta.update(
-                                            {
-                                                "query": query,
-                                                "source": source,
-                                                "timestamp": datetime.utcnow().isoformat() + "Z",
-                                            }
-                                        )
-                                        if use_url_cache and meta.get("url"):
-                                            url_cache.add(meta.get("url"))
-                                        st.session_state.files.append(meta.get("path"))
-                                        st.session_state.metadata.append(meta)
-
-                                        prog.progress(downloaded / num, text=f"Downloaded {downloaded}/{num}")
-                                        if preview and meta.get("path"):
-                                            with preview_area.container():
-                                                st.image(get_thumbnail(meta.get("path")), width=160)
-                                    else:
-                                        skipped[reason] = skipped.get(reason, 0) + 1
-
-                        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                        time.sleep(scroll_delay(source, rate_mode))
+                def render_progress(downloaded, thumbs):
+                    if math.isinf(num):
+                        prog.progress(0.0, text=f"Downloaded {downloaded}")
+                    else:
+                        prog.progress(min(downloaded / num, 1.0), text=f"Downloaded {downloaded}/{num}")
+                    if preview and thumbs:
+                        preview_area.image(thumbs, width=96)
+
+                throttle = ProgressThrottle(render_progress)
+
+                def on_accept(meta, downloaded):
+                    thumb = meta.pop("thumb", None)
+                    if url_cache is not None and meta.get("url"):
+                        url_cache.add(meta.get("url"))
+                    if spill:
+                        spill.append(meta)
+                    else:
+                        st.session_state.files.append(meta.get("path"))
+                        st.session_state.metadata.append(meta)
+                    throttle.update(downloaded, thumb)
+
+                stats = scrape_sources(
+                    driver,
+                    session,
+                    query,
+                    sources,
+                    num,
+                    st.session_state.out_dir,
+                    settings,
+                    state,
+                    downloaded,
+                    on_accept,
+                    trace,
+                )
+                throttle.flush()
 
                 status.update(
-                    label=f"Completed: {downloaded} downloaded, {attempted - downloaded} skipped",
+                    label=f"Completed: {stats['downloaded']} downloaded, {stats['attempted'] - stats['downloaded']} skipped",
                     state="complete",
                 )
-                st.session_state.last_stats = {
-                    "downloaded": downloaded,
-                    "attempted": attempted,
-                    "skipped": skipped,
-                    "retried": retried,
-                    "total_requests": total_requests,
-                    "duration_sec": round(time.time() - run_started_at, 1),
-                }
+                st.session_state.errors.extend(stats.get("write_errors", []))
+                stats["duration_sec"] = round(time.time() - run_started_at, 1)
+                stats["stages"] = trace.histograms()
+                if profiler:
+                    profiler.stop()
+                    stats["profile"] = profiler.top()
+                    stats["profile_idle_pct"] = profiler.idle_pct()
+                st.session_state.last_stats = stats
 
             except Exception as e:
                 st.session_state.errors.append(str(e))
                 status.update(label="Error during scraping", state="error")
                 st.error(str(e))
             finally:
+                if profiler:
+                    profiler.stop()
                 driver.quit()
-
-            save_last_metadata(st.session_state.metadata)
-            if use_url_cache:
-                save_url_cache(url_cache)
+                METRICS.inc("ultra_scraper_drivers_in_use", -1)
+                METRICS.inc("ultra_scraper_runs_active", -1)
+                if METRICS_TEXTFILE:
+                    write_metrics_textfile(METRICS_TEXTFILE)
+                if spill:
+                    try:
+                        spill.commit()
+                    except Exception as e:
+                        st.session_state.errors.append(f"metadata: {e}")
+                    state["found"].close()
+                    state["digests"].close()
+                    clear_sqlite(run_state_path)
+                if url_cache is not None:
+                    url_cache.close()
+
+            if spill:
+                st.session_state.large_run = {"count": spill.count, "files": spill.files}
+            else:
+                save_last_metadata(st.session_state.metadata)
+            if profiler:
+                save_profile(profiler)
+            else:
+                clear_file(PROFILE_PATH)
+            if export_trace:
+                save_trace(trace)
+            else:
+                clear_file(TRACE_PATH)
+            save_source_stats(state["source_stats"])
+            if state["digest_index"] is not None:
+                save_digest_index(state["digest_index"])
             if st.session_state.errors:
                 save_errors(st.session_state.errors)
         else:
             st.error("ChromeDriver not available. Check your browser driver setup.")
 
 # Results Summary
-if st.session_state.metadata:
+if st.session_state.large_run:
+    collection_count = st.session_state.large_run["files"]
+else:
+    collection_count = len(st.session_state.files)
+
+if st.session_state.metadata or st.session_state.large_run:
     st.subheader("Run summary")
-    st.write(f"Downloaded: {len(st.session_state.files)}")
+    st.write(f"Downloaded: {collection_count}")
     st.write(f"Saved to: {st.session_state.out_dir}")
     if st.session_state.last_stats:
         st.write(f"Attempted: {st.session_state.last_stats.get('attempted', 0)}")
@@ -874,17 +2763,54 @@ if st.session_state.metadata:
             st.write("Skipped breakdown:")
             for k, v in skipped.items():
                 st.write(f"- {k}: {v}")
+        stages = st.session_state.last_stats.get("stages", {})
+        if stages:
+            st.write("Stage timings:")
+            for k, v in sorted(stages.items(), key=lambda kv: -kv[1]["total_sec"]):
+                st.write(f"- {k}: {v['total_sec']}s total, {v['count']} calls, p50 {v['p50_ms']}ms, p99 {v['p99_ms']}ms")
+
+        profile = st.session_state.last_stats.get("profile", [])
+        if profile:
+            idle = st.session_state.last_stats.get("profile_idle_pct", 0)
+            st.write(f"Top functions (sampled, {idle}% of samples idle in wait/select; full profile in {PROFILE_PATH}):")
+            for row in profile:
+                st.write(f"- {row['function']}: {row['self_pct']}% self, {row['total_pct']}% total")
 
         report = json.dumps(st.session_state.last_stats, indent=2)
         st.download_button("Download run report", report, "run_report.json", "application/json")
-
-    meta_json = json.dumps(st.session_state.metadata, indent=2)
-    meta_csv = metadata_to_csv(st.session_state.metadata)
-    c1, c2 = st.columns(2)
+        # The trace can be many MB; it is read only once asked for, not on every rerun.
+        if os.path.exists(TRACE_PATH):
+            if st.session_state.trace_download:
+                with open(TRACE_PATH, "rb") as f:
+                    st.download_button(
+                        "Download run trace",
+                        f.read(),
+                        "run_trace.json",
+                        "application/json",
+                        on_click=reset_state,
+                        args=("trace_download", False),
+                    )
+            elif st.button("Prepare run trace"):
+                st.session_state.trace_download = True
+                st.rerun()
+
+    # Exports are built only when asked for, straight from the persisted store.
+    formats = [f for f in EXPORT_FORMATS if f != "Parquet" or PYARROW_AVAILABLE]
+    c1, c2 = st.columns([2, 1])
     with c1:
-        st.download_button("Download metadata (JSON)", meta_json, "metadata.json", "application/json")
+        export_format = st.selectbox("Metadata export format", formats)
     with c2:
-        st.download_button("Download metadata (CSV)", meta_csv, "metadata.csv", "text/csv")
+        if st.button("Prepare export"):
+            try:
+                st.session_state.export = (export_format, export_metadata(export_format))
+            except Exception as e:
+                st.error(f"Export failed: {e}")
+    # Served once: clicking the button clears the export so later reruns don't reread it.
+    if st.session_state.export and os.path.exists(st.session_state.export[1]):
+        fmt, path = st.session_state.export
+        filename, mime = EXPORT_FORMATS[fmt]
+        with open(path, "rb") as f:
+            st.download_button(f"Download metadata ({fmt})", f, filename, mime, on_click=reset_state, args=("export",))
 
 # Errors
 if st.session_state.errors:
@@ -893,9 +2819,21 @@ if st.session_state.errors:
     st.download_button("Download error log", "\n".join(st.session_state.errors), "errors.txt", "text/plain")
 
 # Results Gallery
-if st.session_state.files:
+if collection_count:
     st.divider()
-    st.subheader(f"Collection ({len(st.session_state.files)})")
+    st.subheader(f"Collection ({collection_count})")
+
+    if st.session_state.large_run:
+        pages = max(1, math.ceil(collection_count / GALLERY_PAGE))
+        page = int(st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)) - 1
+        rows = (r for r in iter_metadata() if r.get("path"))
+        gallery = [
+            r["path"]
+            for r in itertools.islice(rows, page * GALLERY_PAGE, (page + 1) * GALLERY_PAGE)
+            if os.path.exists(r["path"])
+        ]
+    else:
+        gallery = st.session_state.files
 
     gc1, gc2, gc3 = st.columns([3, 1, 1])
     with gc2:
@@ -907,7 +2845,7 @@ if st.session_state.files:
 
     cols = st.columns(2)
     sel = []
-    for i, p in enumerate(st.session_state.files):
+    for i, p in enumerate(gallery):
         with cols[i % 2]:
             st.image(get_thumbnail(p), use_container_width=True)
             if st.checkbox("Add", key=f"s_{p}", value=st.session_state.select_all, label_visibility="collapsed"):
@@ -0,0 +1,85 @@
+"""DiskWriter results flowing back to the scrape loop.
+
+    python -m pytest tests/
+"""
+import os
+import sys
+import threading
+
+import pytest
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import streamlit_app as app  # noqa: E402
+from fakes import FakeDriver, ImageServer  # noqa: E402
+
+
+def test_write_resolves_to_the_view(tmp_path):
+    writer = app.DiskWriter().start()
+    obj, view = str(tmp_path / "objects" / "ab.jpg"), str(tmp_path / "a.jpg")
+    first = writer.write(obj, b"x" * 10, [view])
+    plain = writer.write(str(tmp_path / "b.jpg"), b"y" * 10)
+    writer.close()
+    assert first.result() == view
+    assert plain.result() == str(tmp_path / "b.jpg")
+    assert open(view, "rb").read() == b"x" * 10
+
+
+def test_failed_write_raises_and_leaves_no_temp_file(tmp_path):
+    (tmp_path / "taken.jpg").write_bytes(b"other")
+    (tmp_path / "blocker").write_bytes(b"")
+    writer = app.DiskWriter().start()
+    taken = writer.write(str(tmp_path / "taken.jpg"), b"new")
+    unwritable = writer.write(str(tmp_path / "blocker" / "a.jpg"), b"new")
+    thumb = writer.write(str(tmp_path / "taken.jpg"), b"new", optional=True)
+    writer.close()
+    with pytest.raises(FileExistsError):
+        taken.result()
+    with pytest.raises(OSError):
+        unwritable.result()
+    assert thumb.result() == str(tmp_path / "taken.jpg")
+    assert (tmp_path / "taken.jpg").read_bytes() == b"other"
+    assert len(writer.errors) == 2
+    assert not [p for p in os.listdir(tmp_path) if p.endswith(".tmp")]
+
+
+def test_failed_writes_are_not_counted(tmp_path, monkeypatch):
+    server = ImageServer({"sizes": [[800, 800]], "formats": ["jpeg"]})
+    threading.Thread(target=server.httpd.serve_forever, daemon=True).start()
+    pages = {app.url_map("cats", "Unsplash"): "Unsplash"}
+    monkeypatch.setattr(app, "scroll_delay", lambda source, mode: 0)
+    out_dir = str(tmp_path / "out")
+    open(out_dir, "w").close()  # a file where the folder should be: every write fails
+
+    accepted = []
+    state = {"found": set(), "hash_list": [], "digests": set(), "digest_index": None, "source_stats": {}}
+    settings = {
+        "min_res": (300, 300),
+        "min_bytes": 1024,
+        "allow_types": ["jpeg"],
+        "orientation": "Any",
+        "unlock": True,
+        "turbo": True,
+        "rate_mode": "Normal",
+        "max_scrolls": None,
+        "page_wait": 0,
+    }
+    stats = app.scrape_sources(
+        FakeDriver(server.base_url, pages, per_page=6, max_pages=1),
+        requests.Session(),
+        "cats",
+        ["Unsplash"],
+        3,
+        out_dir,
+        settings,
+        state,
+        on_accept=lambda meta, downloaded: accepted.append(meta),
+    )
+    server.httpd.shutdown()
+    assert stats["downloaded"] == 0
+    assert accepted == []
+    assert stats["skipped"]["write_error"] == 6
+    assert stats["write_errors"]
@@ -0,0 +1,79 @@
+"""Digest claims and storage in fast_download.
+
+    python -m pytest tests/
+"""
+import concurrent.futures
+import datetime
+import os
+import sys
+from io import BytesIO
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit_app as app  # noqa: E402
+
+
+def jpeg(size=(800, 800), seed=64):
+    buf = BytesIO()
+    Image.effect_noise(size, seed).convert("RGB").save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+class Session:
+    def __init__(self, content):
+        self.content = content
+
+    def get(self, url, **kwargs):
+        response = type("Response", (), {})()
+        response.status_code = 200
+        response.content = self.content
+        response.elapsed = datetime.timedelta(0)
+        return response
+
+
+def download(content, folder, name, digests, min_size=(300, 300), digest_index=None):
+    meta, reason, _ = app.fast_download(
+        Session(content), f"https://img.example/{name}", folder, name, min_size, 1024, ["jpeg"], "Any", [], digests, digest_index
+    )
+    return meta, reason
+
+
+def test_identical_concurrent_downloads_are_decoded_once(tmp_path, monkeypatch):
+    decodes = []
+    real_open = Image.open
+    monkeypatch.setattr(Image, "open", lambda *a, **k: decodes.append(1) or real_open(*a, **k))
+    content, digests = jpeg(), set()
+    with concurrent.futures.ThreadPoolExecutor(8) as exe:
+        reasons = list(exe.map(lambda i: download(content, str(tmp_path), f"n{i}", digests)[1], range(8)))
+    assert sorted(reasons) == ["exact_duplicate"] * 7 + ["ok"]
+    assert len(decodes) == 2  # verify() + the real open, once
+
+
+def test_deterministic_rejection_keeps_the_claim(tmp_path):
+    content, digests = jpeg(), set()
+    assert download(content, str(tmp_path), "a", digests, min_size=(5000, 5000))[1] == "low_res"
+    assert download(content, str(tmp_path), "b", digests, min_size=(5000, 5000))[1] == "exact_duplicate"
+    assert download(b"not an image" * 200, str(tmp_path), "c", digests)[1] == "decode_error"
+    assert download(b"not an image" * 200, str(tmp_path), "d", digests)[1] == "exact_duplicate"
+
+
+def test_unexpected_error_releases_the_claim(tmp_path):
+    content, digests = jpeg(), set()
+    blocked = tmp_path / "file"
+    blocked.write_bytes(b"")
+    assert download(content, str(blocked), "a", digests)[1] == "error"
+    assert download(content, str(tmp_path), "b", digests)[1] == "ok"
+
+
+def test_cas_view_falls_back_to_the_object_without_copying(tmp_path, monkeypatch):
+    def no_links(src, dst):
+        raise OSError("hardlinks unsupported")
+
+    monkeypatch.setattr(os, "link", no_links)
+    meta, reason = download(jpeg(), str(tmp_path), "a", set(), digest_index={})
+    assert reason == "ok"
+    assert meta["path"] == meta["object"]
+    assert sorted(os.listdir(tmp_path)) == ["objects"]
@@ -0,0 +1,31 @@
+"""Gauges shared by concurrent runs.
+
+    python -m pytest tests/
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit_app as app  # noqa: E402
+
+
+def gauge_value(name, **labels):
+    with app.METRICS.lock:
+        return app.METRICS.values.get(app.Metrics.key(name, labels), 0)
+
+
+def test_concurrent_runs_add_up_and_clear_only_their_share():
+    name = "ultra_scraper_queue_depth"
+    before = gauge_value(name, source="Test")
+    first = app.RunGauge(name, source="Test")
+    second = app.RunGauge(name, source="Test")
+    first.set(10)
+    second.set(4)
+    first.set(7)
+    assert gauge_value(name, source="Test") - before == 11
+    first.clear()
+    assert gauge_value(name, source="Test") - before == 4
+    second.add(-4)
+    assert gauge_value(name, source="Test") == before
@@ -0,0 +1,40 @@
+"""Download queue ordering and learned acceptance rates.
+
+    python -m pytest tests/
+"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit_app as app  # noqa: E402
+
+ORIGINAL = "https://i.pinimg.com/originals/ab/cd/x.jpg"
+THUMB = "https://i.pinimg.com/736x/ab/cd/y.jpg"
+
+
+def test_outcomes_from_another_quality_level_are_ignored():
+    stats = {}
+    for _ in range(200):
+        app.record_outcome(stats, "Pinterest", 300, "s", True)
+    assert app.candidate_score("Pinterest", 736, 300, stats) > 0.95
+    # An Ultra run still prefers originals over 736px thumbnails.
+    assert app.candidate_score("Pinterest", 736, 1000, stats) == 0.15
+    assert app.candidate_score("Pinterest", 4000, 1000, stats) == 0.9
+
+
+def test_queue_pops_best_candidates_and_defers_unlikely_ones():
+    queue = []
+    app.push_candidate(queue, THUMB, "Pinterest", 0, 1000, {})
+    app.push_candidate(queue, ORIGINAL, "Pinterest", 0, 1000, {})
+    assert app.pop_candidates(queue, 10, app.DEFER_BELOW) == [(ORIGINAL, "l")]
+    assert app.pop_candidates(queue, 10, 0.0) == [(THUMB, "s")]
+
+
+def test_legacy_source_stats_are_dropped(tmp_path, monkeypatch):
+    path = tmp_path / "source_stats.json"
+    path.write_text(json.dumps({"Pinterest": {"s": [200, 200], "1000": {"l": [5, 6]}}}))
+    monkeypatch.setattr(app, "SOURCE_STATS_PATH", str(path))
+    assert app.load_source_stats() == {"Pinterest": {"1000": {"l": [5, 6]}}}
@@ -0,0 +1,62 @@
+"""High-res URL resolution and page extraction.
+
+    python -m pytest tests/
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import streamlit_app as app  # noqa: E402
+from fakes import FakeDriver  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "source, url, expected",
+    [
+        ("Pinterest", "https://i.pinimg.com/736x/ab/cd/x.jpg", "https://i.pinimg.com/originals/ab/cd/x.jpg"),
+        ("Unsplash", "https://images.unsplash.com/photo-1?w=400&q=80", "https://images.unsplash.com/photo-1"),
+        ("Pixabay", "https://cdn.pixabay.com/photo/2023/01/01/x_340.jpg", "https://cdn.pixabay.com/photo/2023/01/01/x_1280.jpg"),
+        ("Flickr", "https://live.staticflickr.com/65535/123_abc_n.jpg", "https://live.staticflickr.com/65535/123_abc_b.jpg"),
+        ("Flickr", "https://live.staticflickr.com/65535/123_abc_z.jpg", "https://live.staticflickr.com/65535/123_abc_b.jpg"),
+        ("Flickr", "https://live.staticflickr.com/65535/123_abc_h.jpg", "https://live.staticflickr.com/65535/123_abc_h.jpg"),
+        ("Flickr", "https://live.staticflickr.com/65535/123_abc_k.jpg", "https://live.staticflickr.com/65535/123_abc_k.jpg"),
+        ("Flickr", "https://live.staticflickr.com/65535/123_def_o.jpg", "https://live.staticflickr.com/65535/123_def_o.jpg"),
+        ("Wallhaven", "https://th.wallhaven.cc/small/ab/wallhaven-abcd12.jpg", "https://w.wallhaven.cc/full/ab/wallhaven-abcd12.jpg"),
+        ("Wallhaven", "https://w.wallhaven.cc/full/ab/wallhaven-abcd12.png", "https://w.wallhaven.cc/full/ab/wallhaven-abcd12.png"),
+        (
+            "Wikimedia Commons",
+            "https://upload.wikimedia.org/wikipedia/commons/thumb/a/ab/X.jpg/320px-X.jpg",
+            "https://upload.wikimedia.org/wikipedia/commons/a/ab/X.jpg",
+        ),
+    ],
+)
+def test_resolve_high_res(source, url, expected):
+    assert app.resolve_high_res(url, source) == expected
+
+
+def test_page_source_extraction_finds_urls():
+    html = '<img src="https://i.pinimg.com/originals/ab/cd/x.jpg"><script>{"u":"https://i.pinimg.com/originals/ef/01/y.png"}</script>'
+    assert app.extract_from_page_source(html, "Pinterest") == [
+        "https://i.pinimg.com/originals/ab/cd/x.jpg",
+        "https://i.pinimg.com/originals/ef/01/y.png",
+    ]
+
+
+def test_each_scroll_only_extracts_new_images():
+    pages = {app.url_map("cats", "Pinterest"): "Pinterest"}
+    driver = FakeDriver("https://img.example", pages, per_page=10, max_pages=3)
+    driver.get(app.url_map("cats", "Pinterest"))
+    first = app.extract_image_urls(driver, "Pinterest")
+    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    second = app.extract_image_urls(driver, "Pinterest")
+    assert len(first) == len(second) == 20  # srcset + src per image
+    assert not set(first) & set(second)
+    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    app.extract_image_urls(driver, "Pinterest")
+    assert app.extract_image_urls(driver, "Pinterest") == []
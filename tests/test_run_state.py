@@ -0,0 +1,33 @@
+"""Per-run scratch state of large runs.
+
+    python -m pytest tests/
+"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit_app as app  # noqa: E402
+
+
+def test_concurrent_spills_commit_independently(tmp_path):
+    path = str(tmp_path / "last_metadata.jsonl")
+    first, second = app.MetadataSpill(path), app.MetadataSpill(path)
+    first.append({"url": "a"})
+    second.append({"url": "b"})
+    first.commit()
+    second.commit()
+    assert [json.loads(line)["url"] for line in open(path)] == ["b"]
+    assert os.listdir(tmp_path) == ["last_metadata.jsonl"]
+
+
+def test_clear_sqlite_removes_wal_files(tmp_path):
+    path = str(tmp_path / "run_state.sqlite")
+    found = app.SpillSet(path, "found")
+    found.add("https://img.example/a.jpg")
+    assert os.path.exists(path + "-wal")
+    found.close()
+    assert app.clear_sqlite(path)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,184 @@
+"""Lease expiry and recovery in the distributed work queue.
+
+    python -m pytest tests/
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import streamlit_app as app  # noqa: E402
+from fakes import FakeDriver, ImageServer  # noqa: E402
+
+SETTINGS = {
+    "min_res": [300, 300],
+    "min_bytes": 1024,
+    "allow_types": ["jpeg", "png", "webp"],
+    "orientation": "Any",
+    "unlock": True,
+    "turbo": True,
+    "rate_mode": "Normal",
+    "preview": False,
+    "max_scrolls": None,
+    "page_wait": 0,
+}
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "queue.sqlite")
+
+
+def status(work, task_id):
+    with work.lock:
+        return work.conn.execute("SELECT status, worker, attempts FROM tasks WHERE id = ?", (task_id,)).fetchone()
+
+
+def test_live_lease_is_not_handed_out(queue_path):
+    work = app.WorkQueue(queue_path)
+    work.enqueue(["cats"], ["Unsplash"], 10, SETTINGS)
+    assert work.lease("a", 60)["query"] == "cats"
+    assert work.lease("b", 60) == {}
+
+
+def test_expired_lease_is_reclaimed(queue_path):
+    work = app.WorkQueue(queue_path)
+    work.enqueue(["cats"], ["Unsplash"], 10, SETTINGS)
+    first = work.lease("a", 0.05)
+    time.sleep(0.1)
+    second = work.lease("b", 60)
+    assert second["id"] == first["id"]
+    assert status(work, first["id"]) == ("leased", "b", 2)
+
+    # The dead worker's late report must not clobber the new owner's lease.
+    work.complete(first["id"], "a", {"downloaded": 1})
+    assert status(work, first["id"])[0] == "leased"
+    work.complete(first["id"], "b", {"downloaded": 2})
+    assert status(work, first["id"])[0] == "done"
+    assert work.lease("c", 60) is None
+
+
+def test_renew_keeps_the_lease(queue_path):
+    work = app.WorkQueue(queue_path)
+    work.enqueue(["cats"], ["Unsplash"], 10, SETTINGS)
+    task = work.lease("a", 0.2)
+    for _ in range(3):
+        time.sleep(0.1)
+        work.renew(task["id"], "a", 0.2)
+    assert work.lease("b", 60) == {}
+
+
+def test_task_fails_after_max_attempts(queue_path):
+    work = app.WorkQueue(queue_path)
+    work.enqueue(["cats"], ["Unsplash"], 10, SETTINGS)
+    for i in range(app.MAX_ATTEMPTS):
+        task = work.lease(f"w{i}", 0.01)
+        assert task
+        time.sleep(0.02)
+    assert work.lease("last", 60) is None
+    assert status(work, task["id"])[0] == "failed"
+
+
+def test_fail_requeues_until_max_attempts(queue_path):
+    work = app.WorkQueue(queue_path)
+    work.enqueue(["cats"], ["Unsplash"], 10, SETTINGS)
+    task = work.lease("a", 60)
+    work.fail(task["id"], "a", "boom")
+    assert status(work, task["id"])[0] == "pending"
+    assert work.lease("b", 60)["id"] == task["id"]
+
+
+def test_lease_skips_a_task_out_of_attempts(queue_path):
+    work = app.WorkQueue(queue_path)
+    work.enqueue(["cats", "dogs"], ["Unsplash"], 10, SETTINGS)
+    for i in range(app.MAX_ATTEMPTS):
+        assert work.lease(f"w{i}", 0.01)["query"] == "cats"
+        time.sleep(0.02)
+    assert work.lease("next", 60)["query"] == "dogs"
+
+
+def test_released_task_resumes_its_count(queue_path):
+    work = app.WorkQueue(queue_path)
+    work.enqueue(["cats"], ["Unsplash"], 10, SETTINGS)
+    task = work.lease("a", 0.05)
+    assert task["downloaded"] == 0
+    for i in range(2):
+        work.record_image(task["id"], "a", {"url": f"https://img.example/{i}.jpg", "sha256": str(i)})
+    time.sleep(0.1)
+    assert work.lease("b", 60)["downloaded"] == 2
+
+
+def test_dead_workers_claims_are_released(queue_path):
+    work = app.WorkQueue(queue_path)
+    work.enqueue(["cats"], ["Unsplash"], 10, SETTINGS)
+    task = work.lease("a", 0.05)
+    digests = app.ClaimedDigests(queue_path, "a")
+    digests.task_id = task["id"]
+    assert digests.claim("recorded") and digests.claim("in-flight")
+    work.record_image(task["id"], "a", {"url": "https://img.example/0.jpg", "sha256": "recorded"})
+    time.sleep(0.1)
+
+    other = app.ClaimedDigests(queue_path, "b")
+    assert not other.claim("in-flight")
+    other.task_id = work.lease("b", 60)["id"]
+    assert "recorded" in other
+    assert other.claim("in-flight")
+    work.complete(task["id"], "b", {})
+    assert "in-flight" in other
+
+
+def test_task_recovers_after_worker_dies(queue_path, tmp_path, monkeypatch):
+    server = ImageServer({"sizes": [[800, 800]], "formats": ["jpeg"]})
+    threading.Thread(target=server.httpd.serve_forever, daemon=True).start()
+    pages = {app.url_map("cats", "Unsplash"): "Unsplash"}
+    monkeypatch.setattr(app, "setup_driver", lambda: FakeDriver(server.base_url, pages, per_page=24, max_pages=1))
+    monkeypatch.setattr(app, "scroll_delay", lambda source, mode: 0)
+    out_dir = str(tmp_path / "out")
+    os.makedirs(out_dir)
+
+    work = app.WorkQueue(queue_path)
+    work.enqueue(["cats"], ["Unsplash"], 0, SETTINGS)
+
+    # Worker "a" discovers the whole page, accepts 3 images and dies without reporting.
+    task = work.lease("a", 0.5)
+    accepted = app.SpillSet(queue_path, "urls", persist=True, shared=True)
+    state = {
+        "found": app.TaskFound(accepted),
+        "hash_list": [],
+        "digests": app.SpillSet(queue_path, "digests", persist=True, shared=True),
+        "digest_index": None,
+        "source_stats": {},
+    }
+
+    def on_accept(meta, downloaded):
+        work.record_image(task["id"], "a", meta)
+        accepted.add(meta["url"])
+
+    stats = app.scrape_sources(
+        app.setup_driver(),
+        requests.Session(),
+        "cats",
+        ["Unsplash"],
+        3,
+        out_dir,
+        dict(SETTINGS, min_res=(300, 300)),
+        state,
+        on_accept=on_accept,
+    )
+    assert stats["downloaded"] == 3
+    time.sleep(0.6)
+
+    assert app.run_worker(queue_path, "b", out_dir, lease_sec=30, idle_sleep=0.1) == 0
+    assert status(work, task["id"])[:2] == ("done", "b")
+    summary = work.summary()
+    per_worker = {w["worker"]: w["images"] for w in summary["workers"]}
+    server.httpd.shutdown()
+    # "b" picks up every candidate "a" discovered but never accepted.
+    assert per_worker == {"a": 3, "b": 24 - 3}